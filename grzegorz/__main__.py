@@ -13,9 +13,32 @@
 # You should have received a copy of the GNU General Public License along with
 # grzegorz.  If not, see <https://www.gnu.org/licenses/>.
 
-from grzegorz.subcommands import *
+from grzegorz.cache import DEFAULT_LOOKUP_TTL_DAYS
+from grzegorz.io import (DEFAULT_FLUSH_EVERY, DEFAULT_FLUSH_INTERVAL)
 
 import argparse
+from os import cpu_count
+
+def add_instrumentation_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--report',
+            type=str,
+            dest='report',
+            metavar='FILE',
+            help='write how long every stage took, fetch latencies and generator counters to FILE, as JSON')
+    parser.add_argument('--profile',
+            type=str,
+            dest='profile',
+            metavar='DIR',
+            help='profile every stage with cProfile, dumping the statistics into DIR')
+
+def check_feature_distance(parser: argparse.ArgumentParser, command: str,
+                           args: argparse.Namespace) -> None:
+    if args.feature_distance is None:
+        return
+    if args.feature_distance < 0:
+        parser.error(command + ": --feature-distance can't be negative")
+    if args.nooptimise or args.path is not None:
+        parser.error(command + ": --feature-distance can't be used with --no-optimise or --filter-file")
 
 # Why does it have to be this complicated?
 def create_argparser() -> argparse.ArgumentParser:
@@ -28,15 +51,43 @@ def create_argparser() -> argparse.ArgumentParser:
     parser_analyse = subparsers.add_parser('analyse',
             help='Parse the given IPA transcription')
     parser_analyse.add_argument('ipa',
-            type=str)
+            type=str,
+            nargs='?')
+    parser_analyse.add_argument('--batch',
+            type=str,
+            dest='batch',
+            metavar='FILE',
+            help='parse every IPA in FILE ("-" for stdin), one per line, printing JSON Lines')
+    parser_analyse.add_argument('--numproc',
+            type=int,
+            dest='numproc',
+            default=cpu_count() or 1,
+            help='Number of processes parsing IPAs in batch mode; default: number of CPUs')
 
     # 'check' subcommand
     parser_check = subparsers.add_parser('check',
             help='Check if the two given IPAs can form a minimal pair')
     parser_check.add_argument('ipa_first',
-            type=str)
+            type=str,
+            nargs='?')
     parser_check.add_argument('ipa_second',
-            type=str)
+            type=str,
+            nargs='?')
+    parser_check.add_argument('--batch',
+            type=str,
+            dest='batch',
+            metavar='FILE',
+            help='check every pair of tab-separated IPAs in FILE ("-" for stdin), one per line, printing one verdict per line')
+    parser_check.add_argument('--numproc',
+            type=int,
+            dest='numproc',
+            default=cpu_count() or 1,
+            help='Number of processes checking pairs in batch mode; default: number of CPUs')
+    parser_check.add_argument('--keep-indels',
+            action='store_true',
+            default=False,
+            dest='keep_indels',
+            help='also recognise minimal pairs where one word has a sound more than the other')
 
     # 'list-languages' subcommand
     subparsers.add_parser('list-languages',
@@ -46,7 +97,8 @@ def create_argparser() -> argparse.ArgumentParser:
     parser_fullmake = subparsers.add_parser('fullmake',
             help=f'Build an Anki deck for a language (equivalent of \'wordlist\', \'fetchipa\', \'generate\', \'makedeck\')')
     parser_fullmake.add_argument('language',
-            type=str)
+            type=str,
+            help='language; alternatively, a comma-separated list of languages, e.g. "french,german", or "all"')
     parser_fullmake.add_argument('bounds',
             type=str,
             help='number of words to keep, e.g. "5000"; alternatively, the range of words to keep, e.g. "1500:3000"')
@@ -55,6 +107,17 @@ def create_argparser() -> argparse.ArgumentParser:
             action='store_true',
             default=False,
             help='remove temporary files after building the deck')
+    parser_fullmake.add_argument('--pipeline',
+            dest='pipeline',
+            action='store_true',
+            default=False,
+            help='run all steps at the same time, passing words and minimal pairs on as soon as they\'re ready')
+    parser_fullmake.add_argument('--numproc',
+            type=int,
+            dest='numproc',
+            default=cpu_count() or 1,
+            help='with several languages, number of processes generating minimal pairs and building decks; default: number of CPUs')
+    add_instrumentation_arguments(parser_fullmake)
 
     # 'wordlist' command
     parser_wordlist = subparsers.add_parser('wordlist',
@@ -68,6 +131,22 @@ def create_argparser() -> argparse.ArgumentParser:
     parser_wordlist.add_argument('outfile',
             type=str,
             help='path where the wordlist should be stored')
+    parser_wordlist.add_argument('--no-cache',
+            dest='no_cache',
+            action='store_true',
+            default=False,
+            help='don\'t keep the whole frequency list in the cache; only download the needed words')
+    parser_wordlist.add_argument('--from-corpus',
+            type=str,
+            nargs='+',
+            dest='corpus',
+            metavar='PATH',
+            help='count the words in these local text files, optionally compressed (.gz, .bz2, .xz), instead of downloading a frequency list')
+    parser_wordlist.add_argument('--numproc',
+            type=int,
+            dest='numproc',
+            default=cpu_count() or 1,
+            help='with --from-corpus, number of processes counting words; default: number of CPUs')
 
     # 'fetchipa' subcommand
     parser_fetchipa = subparsers.add_parser('fetchipa',
@@ -86,7 +165,52 @@ def create_argparser() -> argparse.ArgumentParser:
             type=int,
             dest='numproc',
             default=20,
-            help='Number of concurrent processes to handle the wordlist; default: 20')
+            help='Maximum number of concurrent processes to handle the wordlist; default: 20')
+    parser_fetchipa.add_argument('--retries',
+            type=int,
+            dest='retries',
+            default=5,
+            help='Number of times a word is retried if Wiktionary fails or throttles us; default: 5')
+    parser_fetchipa.add_argument('--cache-ttl',
+            type=float,
+            dest='cache_ttl',
+            default=DEFAULT_LOOKUP_TTL_DAYS,
+            help=f'Number of days during which words without IPA aren\'t looked up again; default: {DEFAULT_LOOKUP_TTL_DAYS}')
+    parser_fetchipa.add_argument('--flush-every',
+            type=int,
+            dest='flush_every',
+            default=DEFAULT_FLUSH_EVERY,
+            metavar='N',
+            help=f'Write fetched words to disk at least every N words; default: {DEFAULT_FLUSH_EVERY}')
+    parser_fetchipa.add_argument('--flush-interval',
+            type=float,
+            dest='flush_interval',
+            default=DEFAULT_FLUSH_INTERVAL,
+            metavar='SECONDS',
+            help=f'Write fetched words to disk at least every SECONDS seconds; default: {DEFAULT_FLUSH_INTERVAL}')
+    add_instrumentation_arguments(parser_fetchipa)
+
+    # 'ingestipa' subcommand
+    parser_ingestipa = subparsers.add_parser('ingestipa',
+            help='Take IPA pronunciations for words in a wordlist from a local Wiktionary dump')
+    parser_ingestipa.add_argument('dump',
+            type=str,
+            help='Wiktionary XML dump (.xml) or Wiktextract extract (.jsonl), optionally compressed (.gz, .bz2, .xz)')
+    parser_ingestipa.add_argument('infile',
+            type=str,
+            help='wordlist output file')
+    parser_ingestipa.add_argument('outfile',
+            type=str)
+    parser_ingestipa.add_argument('--keep-failed',
+            dest='keep_failed',
+            action='store_true',
+            default=False,
+            help='In the output file, keep the words with no found IPA (default: don\'t)')
+    parser_ingestipa.add_argument('--numproc',
+            type=int,
+            dest='numproc',
+            default=cpu_count() or 1,
+            help='Number of processes looking for IPAs in the dump\'s entries; decompressing and splitting the dump into entries always happens in a single process; default: number of CPUs')
 
     # 'generate' subcommand
     parser_generate = subparsers.add_parser('generate',
@@ -117,10 +241,61 @@ def create_argparser() -> argparse.ArgumentParser:
             default=False,
             dest="no_stress",
             help="ignore minimal pairs with a difference in syllable stress")
+    parser_generate.add_argument('--keep-indels',
+            action='store_true',
+            default=False,
+            dest="keep_indels",
+            help="also keep minimal pairs where one word has a sound more than the other")
     parser_generate.add_argument('-f', '--filter-file',
             type=str,
             dest="path",
             help="path to file with rules for desired phoneme differences")
+    parser_generate.add_argument('--feature-distance',
+            type=int,
+            dest="feature_distance",
+            metavar='K',
+            help="instead of the default or a file of rules, only keep phoneme differences of at most K distinctive features, e.g. 1 for voicing only")
+    parser_generate.add_argument('--memory-limit',
+            type=int,
+            dest="memory_limit",
+            metavar='MB',
+            help="keep memory use around MB megabytes, spilling words and pairs to temporary files next to the output file")
+    parser_generate.add_argument('--sample',
+            type=int,
+            dest="sample",
+            metavar='N',
+            help="only compare random pairs of words, keep N of the minimal pairs found, and estimate how many a full run would find")
+    parser_generate.add_argument('--time-budget',
+            type=float,
+            dest="time_budget",
+            metavar='SECONDS',
+            help="when sampling, compare pairs of words for at most SECONDS seconds; default: 30")
+    parser_generate.add_argument('--top',
+            type=int,
+            dest="top",
+            metavar='K',
+            help="only keep the K minimal pairs of the most frequent words")
+    parser_generate.add_argument('--contrast-quota',
+            type=int,
+            dest="contrast_quota",
+            metavar='N',
+            help="with --top, keep at most N minimal pairs of every kind (phoneme, chroneme, stress, indel)")
+    parser_generate.add_argument('--pair-quota',
+            type=int,
+            dest="pair_quota",
+            metavar='N',
+            help="with --top, keep at most N minimal pairs contrasting the same sounds")
+    parser_generate.add_argument('--stats',
+            type=str,
+            dest="stats",
+            metavar='FILE',
+            help="write how many minimal pairs there are of every contrast, every two sounds and every syllable position to FILE, as CSV if it ends in .csv, or else as JSON")
+    parser_generate.add_argument('--numproc',
+            type=int,
+            dest="numproc",
+            default=1,
+            help="number of processes comparing words; default: 1")
+    add_instrumentation_arguments(parser_generate)
 
     # 'makedeck' subcommand
     parser_makedeck = subparsers.add_parser('makedeck',
@@ -131,26 +306,129 @@ def create_argparser() -> argparse.ArgumentParser:
     parser_makedeck.add_argument('outfile',
             type=str,
             help="(.apkg extension)")
+    parser_makedeck.add_argument('--split-size',
+            type=int,
+            dest='split_size',
+            metavar='N',
+            help='put at most N minimal pairs in every package, e.g. deck-1.apkg, deck-2.apkg, ...')
+    parser_makedeck.add_argument('--split-by',
+            type=str,
+            dest='split_by',
+            choices=['contrast'],
+            help='put every kind of minimal pair (phoneme, chroneme, stress) in its own package, e.g. deck-phoneme.apkg')
+    parser_makedeck.add_argument('--numproc',
+            type=int,
+            dest='numproc',
+            default=cpu_count() or 1,
+            help='Number of processes building packages with --split-size; default: number of CPUs')
+    parser_makedeck.add_argument('--since',
+            type=str,
+            dest='since',
+            metavar='FILE',
+            help='only package minimal pairs that are new or changed since FILE, a manifest or an .apkg')
+    parser_makedeck.add_argument('--manifest',
+            type=str,
+            dest='manifest',
+            metavar='FILE',
+            help='write the GUID and checksum of every note to FILE, for a later --since')
+    add_instrumentation_arguments(parser_makedeck)
+
+    # 'serve' subcommand
+    parser_serve = subparsers.add_parser('serve',
+            help='Load lexicons once and answer analyse, check and minimal partner queries over HTTP')
+    parser_serve.add_argument('lexicons',
+            type=str,
+            nargs='+',
+            help='files created by fetchipa')
+    parser_serve.add_argument('--host',
+            type=str,
+            dest='host',
+            default='127.0.0.1',
+            help='address to listen on; default: 127.0.0.1')
+    parser_serve.add_argument('--port',
+            type=int,
+            dest='port',
+            default=8080,
+            help='port to listen on; default: 8080')
+    parser_serve.add_argument('--socket',
+            type=str,
+            dest='socket',
+            help='listen on a Unix socket at this path instead')
+    parser_serve.add_argument('--no-optimise',
+            action='store_true',
+            default=False,
+            dest="nooptimise",
+            help="find all possible minimal pairs (default: similar sounds)")
+    parser_serve.add_argument('-f', '--filter-file',
+            type=str,
+            dest="path",
+            help="path to file with rules for desired phoneme differences")
+    parser_serve.add_argument('--feature-distance',
+            type=int,
+            dest="feature_distance",
+            metavar='K',
+            help="instead of the default or a file of rules, only keep phoneme differences of at most K distinctive features")
+    parser_serve.add_argument('--keep-indels',
+            action='store_true',
+            default=False,
+            dest="keep_indels",
+            help="also find minimal pairs where one word has a sound more than the other")
 
     return parser
 
 def main() -> None:
+    # every command imports only what it needs, when it needs it; see
+    # `grzegorz/subcommands.py`
     parser = create_argparser()
     args = parser.parse_args()
 
     cmd = args.subparser_name
 
+    if getattr(args, 'report', None) or getattr(args, 'profile', None):
+        from grzegorz.instrument import start_report
+        import atexit
+        report = start_report(args.profile)
+        if args.report:
+            # also written if the command fails and exits early
+            atexit.register(report.write, args.report)
+
     match cmd:
         case 'fullmake':
             clean = args.clean
             bounds = args.bounds
-            language = args.language.lower()
-            fullmake(language, bounds, clean)
+            if args.language.lower() == "all":
+                from grzegorz.wordlist import VALID_LANGUAGES
+                languages = [name for (name, _) in VALID_LANGUAGES]
+            else:
+                # in the order given, without repeating any
+                languages = list(dict.fromkeys(language.strip().lower()
+                                               for language in args.language.split(",")
+                                               if language.strip()))
+            if len(languages) == 1:
+                from grzegorz.subcommands import fullmake
+                fullmake(languages[0], bounds, clean, args.pipeline)
+            else:
+                if args.pipeline:
+                    parser.error("fullmake: --pipeline only works with a single language")
+                from grzegorz.subcommands import multi_fullmake
+                multi_fullmake(languages, bounds, clean, args.numproc)
         case 'wordlist':
-            status = wordlist_command(args.language.lower(), args.bounds, args.outfile)
+            from grzegorz.subcommands import wordlist_command
+            status = wordlist_command(args.language.lower(), args.bounds, args.outfile,
+                                      not args.no_cache, args.corpus, args.numproc)
             exit(status)
         case 'fetchipa':
-            fetchipa(args.infile, args.outfile, args.keep_failed, args.numproc)
+            from grzegorz.subcommands import fetchipa
+            if args.flush_every < 1:
+                parser.error("fetchipa: --flush-every must be at least 1")
+            if args.flush_interval <= 0:
+                parser.error("fetchipa: --flush-interval must be more than 0")
+            fetchipa(args.infile, args.outfile, args.keep_failed, args.numproc, args.retries,
+                     args.cache_ttl, flush_every=args.flush_every,
+                     flush_interval=args.flush_interval)
+        case 'ingestipa':
+            from grzegorz.subcommands import ingestipa
+            ingestipa(args.dump, args.infile, args.outfile, args.keep_failed, args.numproc)
         case 'generate':
             infile = args.infile
             outfile = args.outfile
@@ -159,15 +437,63 @@ def main() -> None:
             no_chronemes = args.no_chronemes;
             no_stress = args.no_stress;
             filter_file_path = args.path
+            from grzegorz.subcommands import generate_command
+            if args.sample is not None and args.sample < 1:
+                parser.error("generate: --sample must be at least 1")
+            check_feature_distance(parser, "generate", args)
+            # both only ever compare words of the same syllable structure
+            if args.keep_indels and (args.memory_limit is not None or args.sample is not None
+                                     or args.time_budget is not None):
+                parser.error("generate: --keep-indels can't be used with --memory-limit, --sample or --time-budget")
+            for (name, value) in [("--top", args.top),
+                                  ("--contrast-quota", args.contrast_quota),
+                                  ("--pair-quota", args.pair_quota)]:
+                if value is not None and value < 1:
+                    parser.error("generate: " + name + " must be at least 1")
+            if args.top is None and (args.contrast_quota is not None or args.pair_quota is not None):
+                parser.error("generate: --contrast-quota and --pair-quota only work with --top")
+            if args.top is not None and (args.memory_limit is not None or args.sample is not None
+                                         or args.time_budget is not None):
+                parser.error("generate: --top can't be used with --memory-limit, --sample or --time-budget")
+            if args.numproc > 1 and (args.keep_indels or args.memory_limit is not None
+                                     or args.sample is not None or args.time_budget is not None
+                                     or args.top is not None):
+                parser.error("generate: --numproc can't be used with --keep-indels, --memory-limit, --sample, --time-budget or --top")
             generate_command(infile, outfile, nooptimise, no_phonemes, no_chronemes,
-                     no_stress, filter_file_path)
+                     no_stress, filter_file_path, args.memory_limit, args.sample,
+                     args.time_budget, args.keep_indels, args.top, args.contrast_quota,
+                     args.pair_quota, args.stats, args.numproc, args.feature_distance)
         case 'makedeck':
-            makedeck(args.infile, args.outfile)
+            if args.split_size is not None and args.split_size < 1:
+                parser.error("makedeck: --split-size must be at least 1")
+            from grzegorz.subcommands import makedeck
+            makedeck(args.infile, args.outfile, args.split_size, args.split_by, args.numproc,
+                     args.since, args.manifest)
         case 'analyse':
-            print_analysis(args.ipa)
+            if args.batch is not None:
+                from grzegorz.subcommands import analyse_batch
+                analyse_batch(args.batch, args.numproc)
+            elif args.ipa is not None:
+                from grzegorz.subcommands import print_analysis
+                print_analysis(args.ipa)
+            else:
+                parser.error("analyse: either an IPA or --batch is required")
         case 'check':
-            print_minpair_check(args.ipa_first, args.ipa_second)
+            if args.batch is not None:
+                from grzegorz.subcommands import check_batch
+                check_batch(args.batch, args.numproc, args.keep_indels)
+            elif args.ipa_second is not None:
+                from grzegorz.subcommands import print_minpair_check
+                print_minpair_check(args.ipa_first, args.ipa_second, args.keep_indels)
+            else:
+                parser.error("check: either two IPAs or --batch are required")
+        case 'serve':
+            check_feature_distance(parser, "serve", args)
+            from grzegorz.subcommands import serve
+            serve(args.lexicons, args.host, args.port, args.socket, args.nooptimise,
+                  args.path, args.feature_distance, args.keep_indels)
         case 'list-languages':
+            from grzegorz.subcommands import list_languages
             list_languages()
         case _:
             parser.print_help()
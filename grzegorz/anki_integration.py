@@ -14,9 +14,33 @@
 # grzegorz.  If not, see <https://www.gnu.org/licenses/>.
 
 from grzegorz.word import WordPair
+from grzegorz.pipeline import chunks
 
 import genanki
-from genanki import Note, Deck
+from genanki.apkg_col import APKG_COL
+from genanki.apkg_schema import APKG_SCHEMA
+
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+import zipfile
+from tempfile import mkstemp
+from time import time
+from typing import Iterable
+from zlib import crc32
+
+"""Name and ID of the deck the minimal pairs are put into"""
+DECK_NAME = "grzegorz's minimal pairs"
+DECK_ID = 1597757363 # randomly generated but hardcoded
+
+"""The digits of Anki's base 91 GUIDs"""
+GUID_DIGITS = ("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+               + "!#$%&()*+,-./:;<=>?@[]^_`{|}~")
+
+"""How many notes are built and written to a package at once"""
+NOTE_CHUNK_SIZE = 5000
 
 """The model used for the flashcards is rather simple"""
 grzegorz_minpair_model = genanki.Model(
@@ -120,41 +144,183 @@ You heard: <div class="word">{{Word 2 text}}</div>
 }""",
 )
 
-def minpairs_to_deck(minpairs: list[WordPair]) -> Deck:
-    """Turn a list of minimal pairs into an Anki deck"""
-    notes = [minpair_to_anki_note(mp) for mp in minpairs]
-    return notes_to_deck(notes)
+def minpair_fields(minpair: WordPair) -> list[str]:
+    return [
+        minpair[0].text,
+        '',
+        minpair[0].ipa,
+        minpair[1].text,
+        '',
+        minpair[1].ipa,
+    ]
 
-def export_deck(deck: Deck, outfile: str) -> None:
-    """Package the given deck and write it to a file"""
-    genanki.Package(deck).write_to_file(outfile)
+def note_identity(minpair: WordPair) -> tuple[str, str]:
+    """
+    Return the GUID of the minimal pair's note, along with a checksum of its
+    fields. The GUID only depends on the text and IPA of the two words, so
+    that the same minimal pair is the same note in every deck; it's the GUID
+    genanki gives notes by default, so notes from decks built by earlier
+    versions keep theirs.
+    """
+    fields = minpair_fields(minpair)
+    return (note_guid(fields), fields_checksum(fields))
 
-def minpair_to_anki_note(minpair: WordPair) -> Note:
+def note_guid(fields: list[str]) -> str:
     """
-    Given a minimal pair, create an Anki note from it, with `grzegorz_minpair_model`
-    as its template.
+    Return the same GUID as `genanki.guid_for(*fields)`, only faster: the first
+    8 bytes of the SHA-256 of the fields, in the base 91 that Anki uses
     """
-    note = genanki.Note(
-        model=grzegorz_minpair_model,
-        fields=[
-            minpair[0].text,
-            '',
-            minpair[0].ipa,
-            minpair[1].text,
-            '',
-            minpair[1].ipa,
-        ]
-    )
-    return note
-
-def notes_to_deck(notes: list[Note]) -> Deck:
+    digest = hashlib.sha256("__".join(fields).encode('utf-8')).digest()
+    n = int.from_bytes(digest[:8], 'big')
+    digits = []
+    while n > 0:
+        (n, digit) = divmod(n, 91)
+        digits.append(GUID_DIGITS[digit])
+    return "".join(reversed(digits))
+
+def fields_checksum(fields: list[str]) -> str:
+    return hashlib.sha1("\x1f".join(fields).encode('utf-8')).hexdigest()[:16]
+
+def read_manifest(path: str) -> dict[str, str]:
+    """
+    Return the GUID and checksum of every note listed in a manifest written
+    by `makedeck`, i.e. a file with a GUID and a checksum separated by a tab
+    on every line, or of every note in an Anki package
+    """
+    manifest = {}
+    if not zipfile.is_zipfile(path):
+        with open(path, "r", encoding='utf-8') as f:
+            for line in f:
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) == 2:
+                    manifest[fields[0]] = fields[1]
+        return manifest
+
+    (handle, dbfile) = mkstemp(suffix=".anki2")
+    os.close(handle)
+    try:
+        with zipfile.ZipFile(path) as z:
+            names = z.namelist()
+            name = "collection.anki21" if "collection.anki21" in names else "collection.anki2"
+            with open(dbfile, "wb") as f:
+                f.write(z.read(name))
+        conn = sqlite3.connect(dbfile)
+        try:
+            for (guid, flds) in conn.execute("SELECT guid, flds FROM notes"):
+                manifest[guid] = fields_checksum(flds.split("\x1f"))
+        finally:
+            conn.close()
+    finally:
+        os.remove(dbfile)
+    return manifest
+
+def subdeck(*names: str) -> tuple[str, int]:
     """
-    Put the `Note`s into a `Deck` called "grzegorz's minimal pairs"
+    Return the name and ID of a subdeck of "grzegorz's minimal pairs", e.g.
+    `subdeck("phoneme", "2")` is called "grzegorz's minimal pairs::phoneme 2"
+    in Anki. The ID only depends on the name, so that importing the same
+    subdeck twice doesn't create two decks.
     """
-    deck = genanki.Deck(
-        1597757363, # deck ID, randomly generated but hardcoded
-        "grzegorz's minimal pairs",
-    )
-    for note in notes:
-        deck.add_note(note)
-    return deck
+    name = DECK_NAME + "::" + " ".join(names)
+    return (name, DECK_ID + crc32(name.encode('utf-8')))
+
+def export_minpairs(minpairs: Iterable[WordPair], outfile: str,
+                    deck_name: str = DECK_NAME, deck_id: int = DECK_ID) -> int:
+    """
+    Package the minimal pairs into a deck at `outfile`, a chunk at a time, so
+    that only one chunk is ever in memory. Return the number of minimal pairs.
+    """
+    writer = PackageWriter(outfile, deck_name, deck_id)
+    try:
+        for chunk in chunks(minpairs, NOTE_CHUNK_SIZE):
+            writer.add(chunk)
+    except BaseException:
+        writer.discard()
+        raise
+    writer.close()
+    return writer.count
+
+def card_requirements(model: genanki.Model) -> list[tuple[int, str, list[int]]]:
+    """
+    Return which cards a note of the model gets, depending on which of its
+    fields are empty, like Anki does: `(template ord, "any", field ords)`, for
+    a card that a note only gets if any of those fields isn't empty. The
+    templates of our model have no sections, so a card's question is empty
+    exactly when all the fields it shows are.
+    """
+    requirements = []
+    for (card_ord, template) in enumerate(model.templates):
+        field_ords = [i for (i, field) in enumerate(model.fields)
+                      if "{{" + field['name'] + "}}" in template['qfmt']]
+        requirements.append((card_ord, "any", field_ords))
+    return requirements
+
+class PackageWriter:
+    """
+    Write an Anki deck package of minimal pairs, one batch at a time. Rather
+    than creating a `genanki.Note` for every minimal pair, which then writes
+    itself and its cards one row at a time, the rows genanki would write are
+    built directly and inserted in bulk, all in a single transaction. The
+    package itself is written when the writer is closed.
+
+    Like `genanki.Package.write_to_file()`, ids are derived from `timestamp`,
+    by default the current time.
+    """
+    def __init__(self, outfile: str, deck_name: str, deck_id: int,
+                 timestamp: float | None = None) -> None:
+        self.outfile = outfile
+        self.deck_id = deck_id
+        self.count = 0
+        self.timestamp = time() if timestamp is None else timestamp
+        self.id_gen = itertools.count(int(self.timestamp * 1000))
+        self.card_requirements = card_requirements(grzegorz_minpair_model)
+        (handle, self.dbfile) = mkstemp(suffix=".anki2")
+        os.close(handle)
+        self.conn = sqlite3.connect(self.dbfile)
+        cursor = self.conn.cursor()
+        # the database is only a temporary file until the package is written
+        cursor.execute("PRAGMA journal_mode = OFF")
+        cursor.execute("PRAGMA synchronous = OFF")
+        cursor.executescript(APKG_SCHEMA)
+        cursor.executescript(APKG_COL)
+        deck = genanki.Deck(deck_id, deck_name)
+        deck.add_model(grzegorz_minpair_model)
+        deck.write_to_db(cursor, self.timestamp, self.id_gen)
+
+    def add(self, minpairs: list[WordPair]) -> None:
+        mod = int(self.timestamp)
+        model_id = grzegorz_minpair_model.model_id
+        sort_field = grzegorz_minpair_model.sort_field_index
+        notes = []
+        cards = []
+        for minpair in minpairs:
+            fields = minpair_fields(minpair)
+            # ids are handed out in the same order as genanki does: a note's,
+            # then those of its cards
+            note_id = next(self.id_gen)
+            notes.append((note_id, note_guid(fields), model_id, mod, -1, "  ",
+                          "\x1f".join(fields), fields[sort_field], 0, 0, ""))
+            for (card_ord, _, field_ords) in self.card_requirements:
+                if any(fields[i] for i in field_ords):
+                    cards.append((next(self.id_gen), note_id, self.deck_id, card_ord, mod, -1,
+                                  0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, ""))
+        self.conn.executemany("INSERT INTO notes VALUES(?,?,?,?,?,?,?,?,?,?,?)", notes)
+        self.conn.executemany("INSERT INTO cards VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)", cards)
+        self.count += len(minpairs)
+
+    def close(self) -> None:
+        """Write the package file and remove the temporary database"""
+        try:
+            self.conn.commit()
+            self.conn.close()
+            with zipfile.ZipFile(self.outfile, 'w') as outzip:
+                outzip.write(self.dbfile, 'collection.anki2')
+                outzip.writestr('media', json.dumps({}))
+        finally:
+            self.discard()
+
+    def discard(self) -> None:
+        """Remove the temporary database without writing the package"""
+        self.conn.close()
+        if os.path.exists(self.dbfile):
+            os.remove(self.dbfile)
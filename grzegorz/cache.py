@@ -0,0 +1,100 @@
+# Copyright (c) 2026 xylous <xylous.e@gmail.com>
+#
+# This file is part of grzegorz.
+# grzegorz is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# grzegorz is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# grzegorz.  If not, see <https://www.gnu.org/licenses/>.
+
+from grzegorz.io import readfile
+
+from os import (environ, makedirs)
+from os.path import (exists, expanduser, join)
+from time import time
+
+"""How long, by default, a word without pronunciation isn't looked up again"""
+DEFAULT_LOOKUP_TTL_DAYS = 30
+
+def cache_dir(*subdirs: str) -> str:
+    """
+    Return (and create, if needed) the directory where `grzegorz` keeps its
+    caches, or one of its subdirectories. It can be set with the
+    `GRZEGORZ_CACHE_DIR` environment variable, and otherwise follows the XDG
+    base directory specification.
+    """
+    base = environ.get("GRZEGORZ_CACHE_DIR")
+    if not base:
+        base = join(environ.get("XDG_CACHE_HOME") or expanduser("~/.cache"), "grzegorz")
+    path = join(base, *subdirs)
+    makedirs(path, exist_ok=True)
+    return path
+
+class LookupCache:
+    """
+    Remember, across runs, the outcome of looking up words on Wiktionary in a
+    given language: which words have no pronunciation at all, and under which
+    spelling (e.g. capitalized) the others were found. Missing pronunciations
+    are forgotten after `ttl` seconds, so that new Wiktionary entries are
+    eventually picked up.
+
+    Every lookup is a line in a plain-text file, with the word, the spelling
+    it was found under (empty if it wasn't found) and a timestamp separated by
+    tabs. New lookups are appended, and the last line about a word wins.
+    """
+    def __init__(self, language: str, ttl: float, path: str | None = None) -> None:
+        self.path = path or join(cache_dir("lookups"), language.lower() + ".txt")
+        self.ttl = ttl
+        self.missing = {}
+        self.variants = {}
+        if exists(self.path):
+            for line in readfile(self.path).splitlines():
+                fields = line.split("\t")
+                if len(fields) == 3 and fields[2].isdigit():
+                    self.remember(fields[0], fields[1], int(fields[2]))
+        self.handle = open(self.path, "a", encoding='utf-8')
+
+    def remember(self, word: str, variant: str, timestamp: int) -> None:
+        self.missing.pop(word, None)
+        self.variants.pop(word, None)
+        if variant == "":
+            self.missing[word] = timestamp
+        elif variant != word:
+            self.variants[word] = variant
+
+    def is_missing(self, word: str) -> bool:
+        """Return True if we recently looked `word` up and found nothing"""
+        timestamp = self.missing.get(word)
+        return timestamp is not None and time() - timestamp < self.ttl
+
+    def variant(self, word: str) -> str:
+        """Return the spelling under which `word` should be looked up"""
+        return self.variants.get(word, word)
+
+    def record(self, word: str, variant: str) -> None:
+        """
+        Record that `word` was found under the `variant` spelling, or, if
+        `variant` is empty, that it wasn't found at all
+        """
+        if variant == word and word not in self.missing and word not in self.variants:
+            # nothing worth remembering
+            return
+        timestamp = int(time())
+        self.remember(word, variant, timestamp)
+        self.handle.write(word + "\t" + variant + "\t" + str(timestamp) + "\n")
+        self.handle.flush()
+
+    def close(self) -> None:
+        self.handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
@@ -0,0 +1,91 @@
+# Copyright (c) 2026 xylous <xylous.e@gmail.com>
+#
+# This file is part of grzegorz.
+# grzegorz is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# grzegorz is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# grzegorz.  If not, see <https://www.gnu.org/licenses/>.
+
+from grzegorz.io import open_compressed
+
+import re
+from collections import (Counter, deque)
+from heapq import nsmallest
+from typing import Iterator
+
+"""How many characters of text are handed to a worker process at once"""
+CORPUS_BLOCK_SIZE = 1 << 20
+
+"""
+A word: letters, possibly joined by apostrophes or hyphens, as in "don't" or
+"aujourd'hui"; numbers and punctuation aren't words
+"""
+WORD_PATTERN = re.compile(r"[^\W\d_]+(?:['’-][^\W\d_]+)*")
+
+def corpus_frequencies(paths: list[str], numproc: int) -> Counter:
+    """
+    Count how many times every word occurs in the text files at `paths`,
+    compressed or not. The text is split into blocks, which are counted on
+    `numproc` processes; only a few blocks are ever waiting to be counted,
+    so memory use depends on the number of different words, not on the size
+    of the files.
+    """
+    total = Counter()
+    blocks = corpus_blocks(paths)
+    if numproc <= 1:
+        for block in blocks:
+            total.update(count_words(block))
+        return total
+
+    from multiprocessing import Pool
+    with Pool(numproc) as p:
+        # `imap()` would read the entire corpus ahead of the workers
+        pending = deque()
+        for block in blocks:
+            pending.append(p.apply_async(count_words, (block,)))
+            if len(pending) >= 2 * numproc:
+                total.update(pending.popleft().get())
+        while pending:
+            total.update(pending.popleft().get())
+    return total
+
+def most_frequent(frequencies: Counter, upperbound: int, lowerbound: int = 0) -> list[str]:
+    """
+    Return the words between index `lowerbound` and `upperbound` of the list
+    of words sorted by frequency, most frequent first (and alphabetically, if
+    as frequent). Only the `upperbound` most frequent words are ever sorted.
+    """
+    top = nsmallest(upperbound, frequencies.items(), key=lambda item: (-item[1], item[0]))
+    return [word for (word, _) in top[lowerbound:]]
+
+### HELPER FUNCTIONS ###
+
+def corpus_blocks(paths: list[str], size: int = CORPUS_BLOCK_SIZE) -> Iterator[str]:
+    """
+    Yield the text of the files in blocks of about `size` characters, never
+    splitting a word between two blocks
+    """
+    for path in paths:
+        with open_compressed(path, 'rt') as f:
+            rest = ""
+            while text := f.read(size):
+                text = rest + text
+                # keep whatever comes after the last space for the next block
+                end = max(text.rfind(" "), text.rfind("\n"))
+                if end == -1:
+                    rest = text
+                    continue
+                rest = text[end:]
+                yield text[:end]
+            if rest:
+                yield rest
+
+def count_words(text: str) -> Counter:
+    return Counter(WORD_PATTERN.findall(text.lower()))
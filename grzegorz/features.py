@@ -0,0 +1,271 @@
+# Copyright (c) 2026 xylous <xylous.e@gmail.com>
+#
+# This file is part of grzegorz.
+# grzegorz is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# grzegorz is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# grzegorz.  If not, see <https://www.gnu.org/licenses/>.
+
+class FeatureFilter:
+    """
+    Decide which two sounds are interestingly different by their distinctive
+    features, instead of by hand-written chains: two sounds are interesting if
+    they differ in at most `max_distance` features, e.g. only in voicing for
+    `max_distance = 1`. Sounds whose features aren't known never are.
+
+    Every sound is a bit vector of features, so the number of features two
+    sounds differ in is the number of bits set in the XOR of their vectors.
+    The vectors of the sounds in `PHONE_FEATURES` are computed once, and those
+    of sounds with diacritics the first time they're seen.
+    """
+    def __init__(self, max_distance: int) -> None:
+        self.max_distance = max_distance
+        self.vectors = dict(PHONE_VECTORS)
+
+    def vector(self, sound: str) -> int | None:
+        if sound not in self.vectors:
+            self.vectors[sound] = phone_vector(sound)
+        return self.vectors[sound]
+
+    def distance(self, s1: str, s2: str) -> int | None:
+        """Return the number of features the sounds differ in, or None if either is unknown"""
+        (v1, v2) = (self.vector(s1), self.vector(s2))
+        if v1 is None or v2 is None:
+            return None
+        return (v1 ^ v2).bit_count()
+
+    def interesting(self, s1: str, s2: str) -> bool:
+        distance = self.distance(s1, s2)
+        return distance is not None and distance <= self.max_distance
+
+def phone_vector(sound: str) -> int | None:
+    """
+    Return the feature vector of the sound: that of the longest phone in
+    `PHONE_FEATURES` it begins with, changed by every diacritic after it.
+    Return None if there's no such phone, or a diacritic isn't in
+    `DIACRITIC_FEATURES`.
+    """
+    for end in range(len(sound), 0, -1):
+        if sound[:end] in PHONE_VECTORS:
+            break
+    else:
+        return None
+    vector = PHONE_VECTORS[sound[:end]]
+    for diacritic in sound[end:]:
+        if diacritic not in DIACRITIC_VECTORS:
+            return None
+        (added, removed) = DIACRITIC_VECTORS[diacritic]
+        vector = (vector | added) & ~removed
+    return vector
+
+def features_vector(features: tuple[str]) -> int:
+    """Return the bit vector with the bits of the given features set"""
+    vector = 0
+    for feature in features:
+        vector |= 1 << FEATURES.index(feature)
+    return vector
+
+### CONSTANTS ###
+
+"""
+The distinctive features a sound may have; every feature is one bit of a
+sound's vector, set if the sound has it
+"""
+FEATURES = [
+    # major class
+    'syllabic', 'consonantal', 'sonorant',
+    # manner
+    'continuant', 'delayed release', 'nasal', 'lateral', 'rhotic', 'strident',
+    # laryngeal
+    'voice', 'spread glottis', 'constricted glottis',
+    # place
+    'labial', 'round', 'coronal', 'anterior', 'distributed', 'dorsal',
+    # tongue body, for vowels and secondary articulations
+    'high', 'low', 'front', 'back', 'tense',
+]
+
+STOP = ('consonantal',)
+FRICATIVE = ('consonantal', 'continuant')
+AFFRICATE = ('consonantal', 'delayed release', 'strident')
+NASAL = ('consonantal', 'sonorant', 'nasal', 'voice')
+LIQUID = ('consonantal', 'sonorant', 'continuant', 'voice')
+GLIDE = ('sonorant', 'continuant', 'voice')
+VOWEL = ('syllabic', 'sonorant', 'continuant', 'voice')
+
+BILABIAL = ('labial',)
+LABIODENTAL = ('labial', 'strident')
+DENTAL = ('coronal', 'anterior', 'distributed')
+ALVEOLAR = ('coronal', 'anterior')
+POSTALVEOLAR = ('coronal', 'distributed', 'strident')
+RETROFLEX = ('coronal',)
+ALVEOLOPALATAL = ('coronal', 'distributed', 'dorsal', 'high', 'front')
+PALATAL = ('dorsal', 'high', 'front')
+VELAR = ('dorsal', 'high', 'back')
+UVULAR = ('dorsal', 'back')
+PHARYNGEAL = ('dorsal', 'low', 'back')
+
+"""
+The features of every sound without diacritics that may be found in an IPA
+transcription; sounds written in more than one way, such as affricates with
+and without a tie, or `ɡ` and `g`, have the same features
+"""
+PHONE_FEATURES = {
+    # Plosives
+    'p': STOP + BILABIAL,
+    'b': STOP + BILABIAL + ('voice',),
+    't': STOP + ALVEOLAR,
+    'd': STOP + ALVEOLAR + ('voice',),
+    'ʈ': STOP + RETROFLEX,
+    'ɖ': STOP + RETROFLEX + ('voice',),
+    'c': STOP + PALATAL,
+    'ɟ': STOP + PALATAL + ('voice',),
+    'k': STOP + VELAR,
+    'g': STOP + VELAR + ('voice',),
+    'ɡ': STOP + VELAR + ('voice',),
+    'q': STOP + UVULAR,
+    'ɢ': STOP + UVULAR + ('voice',),
+    'ʔ': ('constricted glottis',),
+
+    # Affricates
+    't͡s': AFFRICATE + ALVEOLAR,
+    'd͡z': AFFRICATE + ALVEOLAR + ('voice',),
+    't͡ʃ': AFFRICATE + POSTALVEOLAR,
+    'd͡ʒ': AFFRICATE + POSTALVEOLAR + ('voice',),
+    't͡ʂ': AFFRICATE + RETROFLEX,
+    'd͡ʐ': AFFRICATE + RETROFLEX + ('voice',),
+    't͡ɕ': AFFRICATE + ALVEOLOPALATAL,
+    'd͡ʑ': AFFRICATE + ALVEOLOPALATAL + ('voice',),
+
+    # Nasals
+    'm': NASAL + BILABIAL,
+    'ɱ': NASAL + LABIODENTAL,
+    'n': NASAL + ALVEOLAR,
+    'ɳ': NASAL + RETROFLEX,
+    'ɲ': NASAL + PALATAL,
+    'ŋ': NASAL + VELAR,
+    'ɴ': NASAL + UVULAR,
+
+    # Fricatives
+    'ɸ': FRICATIVE + BILABIAL,
+    'β': FRICATIVE + BILABIAL + ('voice',),
+    'f': FRICATIVE + LABIODENTAL,
+    'v': FRICATIVE + LABIODENTAL + ('voice',),
+    'θ': FRICATIVE + DENTAL,
+    'ð': FRICATIVE + DENTAL + ('voice',),
+    's': FRICATIVE + ALVEOLAR + ('strident',),
+    'z': FRICATIVE + ALVEOLAR + ('strident', 'voice'),
+    'ʃ': FRICATIVE + POSTALVEOLAR,
+    'ʒ': FRICATIVE + POSTALVEOLAR + ('voice',),
+    'ʂ': FRICATIVE + RETROFLEX + ('strident',),
+    'ʐ': FRICATIVE + RETROFLEX + ('strident', 'voice'),
+    'ɕ': FRICATIVE + ALVEOLOPALATAL + ('strident',),
+    'ś': FRICATIVE + ALVEOLOPALATAL + ('strident',),
+    'ʑ': FRICATIVE + ALVEOLOPALATAL + ('strident', 'voice'),
+    'ç': FRICATIVE + PALATAL,
+    'ʝ': FRICATIVE + PALATAL + ('voice',),
+    'x': FRICATIVE + VELAR,
+    'ɣ': FRICATIVE + VELAR + ('voice',),
+    'χ': FRICATIVE + UVULAR,
+    'ʁ': FRICATIVE + UVULAR + ('voice',),
+    'ħ': FRICATIVE + PHARYNGEAL,
+    'ʕ': FRICATIVE + PHARYNGEAL + ('voice',),
+    'h': ('continuant', 'spread glottis'),
+    'ɦ': ('continuant', 'spread glottis', 'voice'),
+
+    # Liquids
+    'r': LIQUID + ALVEOLAR + ('rhotic',),
+    'ɾ': LIQUID + ALVEOLAR + ('rhotic',),
+    'ɽ': LIQUID + RETROFLEX + ('rhotic',),
+    'ʀ': LIQUID + UVULAR + ('rhotic',),
+    'l': LIQUID + ALVEOLAR + ('lateral',),
+    'ɫ': LIQUID + ALVEOLAR + ('lateral', 'dorsal', 'high', 'back'),
+    'ɭ': LIQUID + RETROFLEX + ('lateral',),
+    'ʎ': LIQUID + PALATAL + ('lateral',),
+    'ʟ': LIQUID + VELAR + ('lateral',),
+
+    # Approximants and semi-vowels
+    'ʋ': GLIDE + BILABIAL,
+    'ɹ': GLIDE + ALVEOLAR + ('rhotic',),
+    'ɻ': GLIDE + RETROFLEX + ('rhotic',),
+    'j': GLIDE + PALATAL,
+    'ɥ': GLIDE + PALATAL + ('labial', 'round'),
+    'ɰ': GLIDE + VELAR,
+    'w': GLIDE + VELAR + ('labial', 'round'),
+
+    # Close vowels
+    'i': VOWEL + ('high', 'front', 'tense'),
+    'y': VOWEL + ('high', 'front', 'tense', 'round'),
+    'ɨ': VOWEL + ('high', 'tense'),
+    'ʉ': VOWEL + ('high', 'tense', 'round'),
+    'ɯ': VOWEL + ('high', 'back', 'tense'),
+    'u': VOWEL + ('high', 'back', 'tense', 'round'),
+    'ɪ': VOWEL + ('high', 'front'),
+    'ʏ': VOWEL + ('high', 'front', 'round'),
+    'ʊ': VOWEL + ('high', 'back', 'round'),
+
+    # Mid vowels
+    'e': VOWEL + ('front', 'tense'),
+    'ø': VOWEL + ('front', 'tense', 'round'),
+    'ɘ': VOWEL + ('tense',),
+    'ɵ': VOWEL + ('tense', 'round'),
+    'ɤ': VOWEL + ('back', 'tense'),
+    'o': VOWEL + ('back', 'tense', 'round'),
+    'ə': VOWEL,
+    'ɛ': VOWEL + ('front',),
+    'œ': VOWEL + ('front', 'round'),
+    'ɜ': VOWEL,
+    'ɞ': VOWEL + ('round',),
+    'ʌ': VOWEL + ('back',),
+    'ɔ': VOWEL + ('back', 'round'),
+
+    # Open vowels
+    'æ': VOWEL + ('low', 'front', 'tense'),
+    'ɐ': VOWEL + ('low', 'tense'),
+    'a': VOWEL + ('low', 'front'),
+    'ä': VOWEL + ('low',),
+    'ɶ': VOWEL + ('low', 'front', 'round'),
+    'ɑ': VOWEL + ('low', 'back'),
+    'ɒ': VOWEL + ('low', 'back', 'round'),
+
+    # Rhotic vowels
+    'ɚ': VOWEL + ('rhotic',),
+    'ɝ': VOWEL + ('rhotic',),
+}
+
+"""
+The features every diacritic adds to and removes from the sound before it,
+as `(added, removed)`
+"""
+DIACRITIC_FEATURES = {
+    'ʰ': (('spread glottis',), ()), # aspirated
+    'ʼ': (('constricted glottis',), ()), # ejective
+    'ˣ': (('delayed release',), ()), # voiceless velar fricative release
+    'ⁿ': (('nasal',), ()), # nasal release
+    'ʲ': (('dorsal', 'high', 'front'), ()), # palatalized
+    'ʷ': (('labial', 'round'), ()), # labialized
+    'ˠ': (('dorsal', 'high', 'back'), ()), # velarized
+    'ˤ': (('dorsal', 'low', 'back'), ()), # pharyngealized
+    '̃': (('nasal',), ()), # nasalized
+    '̥': ((), ('voice',)), # voiceless
+    '̊': ((), ('voice',)), # voiceless
+    '̬': (('voice',), ()), # voiced
+    '̪': (('distributed',), ()), # dental
+    '̩': (('syllabic',), ()), # syllabic consonant
+    '̍': (('syllabic',), ()), # syllabic consonant
+    '̯': ((), ('syllabic',)), # non-syllabic vowel
+}
+
+"""Precomputed constants, the feature vectors of the above"""
+PHONE_VECTORS = {phone: features_vector(features)
+                 for (phone, features) in PHONE_FEATURES.items()}
+PHONE_VECTORS.update({phone.replace('͡', ''): vector
+                      for (phone, vector) in PHONE_VECTORS.items() if '͡' in phone})
+DIACRITIC_VECTORS = {diacritic: (features_vector(added), features_vector(removed))
+                     for (diacritic, (added, removed)) in DIACRITIC_FEATURES.items()}
@@ -18,17 +18,62 @@ from grzegorz.word import Word
 import requests
 from bs4 import BeautifulSoup
 from fake_useragent import UserAgent
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from time import monotonic
 import re
 
+FETCH_TIMEOUT = 15
+"""Seconds after which a request to Wiktionary is given up on"""
+
+CASE_VARIANT_LANGUAGES = ["German"]
+"""
+Languages in which a word might only have an entry in Wiktionary when it's
+capitalized, even though the wordlist has it in lowercase
+"""
+
+class FetchError(Exception):
+    """
+    The page of a word couldn't be fetched; unlike a page without any IPA, it's
+    worth trying again later
+    """
+    def __init__(self, message: str, retry_after: float | None = None,
+                 throttled: bool = False) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.throttled = throttled
+
+class FetchResult:
+    """
+    The outcome of looking up the IPA of `query`: either the `Word` that was
+    found (possibly with an empty IPA), or the `error` that prevented it
+    """
+    def __init__(
+        self,
+        query: str,
+        word: Word | None,
+        latency: float,
+        error: str | None = None,
+        retry_after: float | None = None,
+        throttled: bool = False,
+    ) -> None:
+        self.query = query
+        self.word = word
+        self.latency = latency
+        self.error = error
+        self.retry_after = retry_after
+        self.throttled = throttled
+
 ### HELPER FUNCTIONS ###
-def get_ipa_for_word(word: str, language: str) -> Word:
+def get_ipa_for_word(word: str, language: str, try_variants: bool = True) -> Word:
     """
     Look for the IPA transliteration of the given word in the specified language
     and return a `Word` binding it to the letters. If no transcription was
-    found, then the `ipa` field of the result is empty.
+    found, then the `ipa` field of the result is empty. If the page couldn't be
+    fetched at all, raise a `FetchError`. Unless `try_variants` is False, the
+    capitalized word is looked up as well in `CASE_VARIANT_LANGUAGES`.
     """
-    language = language.capitalize()
-    language = "Serbo-Croatian" if language in ["Croatian", "Serbian"] else language
+    language = wiktionary_language(language)
     url = f"https://en.wiktionary.org/wiki/{word}"
 
     # wiktionary blocks requests with no/standard user-agent
@@ -36,7 +81,19 @@ def get_ipa_for_word(word: str, language: str) -> Word:
     ua = UserAgent()
     headers = {"User-Agent": ua.random}
 
-    webpage = requests.get(url, headers=headers)
+    try:
+        webpage = requests.get(url, headers=headers, timeout=FETCH_TIMEOUT)
+    except requests.RequestException as err:
+        raise FetchError(f"{word}: {err}")
+    # a missing page is a word without IPA; anything else that isn't the page
+    # itself means we should try again
+    if webpage.status_code == 429 or webpage.status_code >= 500:
+        raise FetchError(f"{word}: HTTP {webpage.status_code}",
+                         parse_retry_after(webpage.headers.get("Retry-After")),
+                         True)
+    if webpage.status_code != 200 and webpage.status_code != 404:
+        raise FetchError(f"{word}: HTTP {webpage.status_code}")
+
     soup = BeautifulSoup(webpage.text, "html.parser")
     pronunciations= soup.select(f'li:has(sup:has(a[href="/wiki/Appendix:{language}_pronunciation"]))' )
 
@@ -49,13 +106,48 @@ def get_ipa_for_word(word: str, language: str) -> Word:
             ipa = first_entry.text
 
     # in German, nouns are capitalized, but the wordlist we're using might not
-    # respect that. This accounts for that, but likely reduces performance for
-    # words without any wiktionary entry.
-    if language == "German" and ipa == "" and word != word.capitalize():
-        return get_ipa_for_word(word.capitalize(), language)
+    # respect that. This accounts for that, but costs a second request for
+    # words without any wiktionary entry; `fetchipa` remembers both outcomes in
+    # a `LookupCache`, so that it only happens once.
+    if try_variants and language in CASE_VARIANT_LANGUAGES \
+            and ipa == "" and word != word.capitalize():
+        return get_ipa_for_word(word.capitalize(), language, False)
 
     return Word(word, ipa)
 
+def wiktionary_language(language: str) -> str:
+    """Return the name under which Wiktionary lists the given language"""
+    language = language.capitalize()
+    return "Serbo-Croatian" if language in ["Croatian", "Serbian"] else language
+
+def fetch_word(word: str, language: str, try_variants: bool = True) -> FetchResult:
+    """
+    Wrap `get_ipa_for_word()`, but also report the word that was asked for,
+    since the text of the resulting `Word` may be spelled differently, how
+    long it took, and whether it failed
+    """
+    start = monotonic()
+    try:
+        result = get_ipa_for_word(word, language, try_variants)
+    except FetchError as err:
+        return FetchResult(word, None, monotonic() - start, str(err),
+                           err.retry_after, err.throttled)
+    return FetchResult(word, result, monotonic() - start)
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    Return the number of seconds a `Retry-After` HTTP header asks us to wait;
+    it may hold either a number of seconds or a date
+    """
+    if value is None:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
 
 def first_ipa_pronunciation(ipa_str: str) -> str:
     """Find the first IPA spelling in the given string"""
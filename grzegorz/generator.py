@@ -13,12 +13,12 @@
 # You should have received a copy of the GNU General Public License along with
 # grzegorz.  If not, see <https://www.gnu.org/licenses/>.
 
-from grzegorz.word import (Word, WordPair,
+from grzegorz.word import (Word, WordPair, Phone,
                            PHONEME_MINPAIR, CHRONEME_MINPAIR, STRESS_MINPAIR,
-                           NOT_MINPAIR)
+                           INDEL_MINPAIR, NOT_MINPAIR)
 from grzegorz.io import readfile
+from grzegorz.features import FeatureFilter
 
-from tqdm import tqdm
 from itertools import chain, combinations
 
 class MinPairGenerator:
@@ -28,13 +28,25 @@ class MinPairGenerator:
         keep_phonemes: bool,
         keep_chronemes: bool,
         keep_stress: bool,
+        keep_indels: bool = False,
     ) -> None:
         self.optimise = optimise
         # used for phonemes only; maybe rename?
         self.filter_pairs = DEFAULT_FILTER_PAIRS
+        # if not None, a `FeatureFilter` used instead of `filter_pairs`
+        self.feature_filter = None
         self.keep_phonemes = keep_phonemes
         self.keep_chronemes = keep_chronemes
         self.keep_stress = keep_stress
+        self.keep_indels = keep_indels
+        # words seen by `feed()`
+        self.fed_words = MinPairIndex(self)
+        # if not None, a `Counter` of the reasons why pairs were rejected, by
+        # `rejection_reason()`
+        self.rejections = None
+        # if not None, a `ContrastStats` that every minimal pair generated is
+        # added to
+        self.stats = None
 
     def set_filter_pairs_from_file(self, path: str) -> None:
         """NOTE: the file must have comma-separated values, with the phones that
@@ -46,10 +58,18 @@ class MinPairGenerator:
                 lists_of_phonemes.append(line.replace(" ", "").split(","))
         self.filter_pairs = phoneme_lists_to_phoneme_pairs(lists_of_phonemes)
 
+    def set_feature_distance(self, max_distance: int) -> None:
+        """Only keep phoneme contrasts of sounds differing in at most
+        `max_distance` distinctive features, instead of using `filter_pairs`"""
+        self.feature_filter = FeatureFilter(max_distance)
+
     def generate(self, words: list[Word], silent: bool = True) -> list[WordPair]:
         """
         Generate minimal pairs from the given parameters
         """
+        # imported here, so that merely checking pairs doesn't need it
+        from tqdm import tqdm
+
         minpairs = []
 
         progress_bar = tqdm(total=int(len(words) * (len(words) - 1) / 2), disable=silent)
@@ -57,35 +77,129 @@ class MinPairGenerator:
             words_after = range(i+1, len(words))
             for j in words_after:
                 pair = (words[i], words[j])
-                if self.check_minpair(pair):
+                verdict = self.check_minpair(pair)
+                if verdict:
                     minpairs.append(pair)
+                    if self.stats is not None:
+                        self.stats.add(pair, verdict)
             progress_bar.update(len(words_after))
         progress_bar.close()
 
         return minpairs
 
-    def check_minpair(self, pair: WordPair) -> int:
+    def generate_indexed(self, words: list[Word], silent: bool = True) -> list[WordPair]:
+        """
+        Find the same minimal pairs as `generate()`, in the same order, but
+        through a `MinPairIndex`, so that every word is only compared to the
+        words it may form a minimal pair with, instead of to all of them
+        """
+        from tqdm import tqdm
+
+        positions = {id(word): i for (i, word) in enumerate(words)}
+        index = MinPairIndex(self)
+        found = []
+        for word in tqdm(words, disable=silent, unit=" words"):
+            for (other, verdict) in index.partners(word):
+                found.append((positions[id(other)], positions[id(word)], verdict))
+            index.add(word)
+        found.sort()
+
+        minpairs = []
+        for (i, j, verdict) in found:
+            minpairs.append((words[i], words[j]))
+            if self.stats is not None:
+                self.stats.add(minpairs[-1], verdict)
+        return minpairs
+
+    def feed(self, word: Word) -> list[WordPair]:
+        """
+        Add a word to the ones fed so far, and return the minimal pairs it
+        forms with them. Feeding a list of words one by one finds the same
+        minimal pairs as `generate()`, but words can be fed as they come.
+        """
+        minpairs = [(other, word) for (other, _) in self.fed_words.partners(word)]
+        self.fed_words.add(word)
+        return minpairs
+
+    def kept_contrasts(self) -> set[int]:
+        """Return the kinds of minimal pairs that are kept"""
+        contrasts = set()
+        if self.keep_phonemes:
+            contrasts.add(PHONEME_MINPAIR)
+        if self.keep_chronemes:
+            contrasts.add(CHRONEME_MINPAIR)
+        if self.keep_stress:
+            contrasts.add(STRESS_MINPAIR)
+        if self.keep_indels:
+            contrasts.add(INDEL_MINPAIR)
+        return contrasts
+
+    def check_minpair(self, pair: WordPair, contrasts: set[int] | None = None) -> int:
         """
         If the given pair is not a minpair, return NOT_MINPAIR; otherwise,
-        return, per case, PHONEME_MINPAIR, CHRONEME_MINPAIR or STRESS_MINPAIR
+        return, per case, PHONEME_MINPAIR, CHRONEME_MINPAIR, STRESS_MINPAIR or
+        INDEL_MINPAIR.
+        Only the `contrasts` given are checked for, by default the kept ones.
         """
+        if contrasts is None:
+            contrasts = self.kept_contrasts()
         # Skip empty entries
         if not pair[0].phonology or not pair[1].phonology:
-            return False
+            verdict = NOT_MINPAIR
         # A minimal pair is kept if it has an interesting difference.
-        if self.keep_phonemes and self.check_phoneme_contrast(pair):
+        elif PHONEME_MINPAIR in contrasts and self.check_phoneme_contrast(pair):
             return PHONEME_MINPAIR
-        elif self.keep_chronemes and self.check_chroneme_contrast(pair):
+        elif CHRONEME_MINPAIR in contrasts and self.check_chroneme_contrast(pair):
             return CHRONEME_MINPAIR
-        elif self.keep_stress and self.check_stress_contrast(pair):
+        elif STRESS_MINPAIR in contrasts and self.check_stress_contrast(pair):
             return STRESS_MINPAIR
+        elif INDEL_MINPAIR in contrasts and self.check_indel_contrast(pair):
+            return INDEL_MINPAIR
         else:
-            return NOT_MINPAIR
+            verdict = NOT_MINPAIR
+        if self.rejections is not None:
+            self.rejections[self.rejection_reason(pair, contrasts)] += 1
+        return verdict
+
+    def rejection_reason(self, pair: WordPair, contrasts: set[int]) -> str:
+        """
+        Return why `check_minpair()` found that the pair isn't a minimal pair
+        based on any of the `contrasts`
+        """
+        first = pair[0].phonology
+        last = pair[1].phonology
+        if not first or not last:
+            return "no IPA"
+        if len(first) != len(last):
+            return "syllable count"
+        if word_shape(pair[0]) != word_shape(pair[1]):
+            return "syllable length"
+        sound_diffs = [(s1, s2) for (s1, s2) in zip(word_sounds(pair[0]), word_sounds(pair[1]))
+                       if s1 != s2]
+        if len(sound_diffs) > 1:
+            return "several differences"
+        if len(sound_diffs) == 1 and PHONEME_MINPAIR in contrasts:
+            return "filtered"
+        if len(sound_diffs) == 0 and first == last:
+            return "identical"
+        return "contrast not kept"
+
+    def contrast(self, pair: WordPair) -> tuple[int, list[tuple[str, str]]]:
+        """
+        Return the verdict of `check_minpair()`, along with what differs
+        between the two words: the pairs of differing phones for phoneme and
+        chroneme contrasts, and the pairs of differing stress marks for stress
+        contrasts
+        """
+        verdict = self.check_minpair(pair)
+        return (verdict, contrast_differences(pair, verdict))
 
     def check_optimised_phone_pair(self, s1: str, s2: str) -> bool:
         """
         Two sounds are interestingly different if they are likely to be confused
         """
+        if self.feature_filter is not None:
+            return self.feature_filter.interesting(s1, s2)
         for diff in self.filter_pairs:
             if s1 in diff and s2 in diff and s1 != s2:
                 return True
@@ -103,6 +217,8 @@ class MinPairGenerator:
             print("minimal pair based on chroneme difference")
         elif verdict == STRESS_MINPAIR:
             print("minimal pair based on syllable stress difference")
+        elif verdict == INDEL_MINPAIR:
+            print("minimal pair based on an inserted or deleted sound")
         else:
             print("not minimal pair")
         return verdict
@@ -179,8 +295,207 @@ class MinPairGenerator:
 
         return fst_stress != snd_stress
 
+    def check_indel_contrast(self, pair: WordPair) -> bool:
+        """Check if the two `Word`s form a minimal pair based on a sound that
+        one of them has and the other doesn't, all other sounds being the same
+        (e.g. "sport" and "spot")"""
+        first = word_sounds(pair[0])
+        last = word_sounds(pair[1])
+        if len(first) == len(last) + 1:
+            (longer, shorter) = (first, last)
+        elif len(last) == len(first) + 1:
+            (longer, shorter) = (last, first)
+        else:
+            return False
+        # skip the sounds both words start with; the one after is the extra
+        # one, and the rest must be the same
+        i = 0
+        while i < len(shorter) and longer[i] == shorter[i]:
+            i += 1
+        return longer[i+1:] == shorter[i:]
+
+class MinPairIndex:
+    """
+    The words of a lexicon, indexed so that the minimal pairs one word forms
+    with the others can be found without comparing it to all of them.
+
+    Words that form a phoneme minimal pair have the same sounds everywhere but
+    in one position; thus, every word is filed under each of its sounds
+    left out in turn, and the words that share one of these keys with a given
+    word are the only ones that can form a phoneme contrast with it. Chroneme
+    and stress contrasts need all the sounds to be the same, so for those,
+    words are filed under their sounds. If the generator keeps insertions and
+    deletions, words are also filed under their sounds with each one left out,
+    since a word with one sound more or less must match one of those.
+    Candidates are then checked with
+    `MinPairGenerator.check_minpair()`, so the verdicts are always the same as
+    those of `generate()`.
+    """
+    def __init__(self, generator: MinPairGenerator, words: list[Word] | None = None) -> None:
+        self.generator = generator
+        # key -> words filed under it, in the order they were added
+        self.buckets = {}
+        # word -> when it was added, so that partners come in a stable order
+        self.added = {}
+        self.count = 0
+        for word in words or []:
+            self.add(word)
+
+    def __len__(self) -> int:
+        return len(self.added)
+
+    def __contains__(self, word: Word) -> bool:
+        return word in self.added
+
+    def add(self, word: Word) -> None:
+        """Add a word to the index; words without IPA are ignored"""
+        if not word.phonology or word in self.added:
+            return
+        self.added[word] = self.count
+        self.count += 1
+        for key in self.keys(word):
+            self.buckets.setdefault(key, {})[word] = None
+
+    def remove(self, word: Word) -> None:
+        """Remove a word from the index, if it's there"""
+        if self.added.pop(word, None) is None:
+            return
+        for key in self.keys(word):
+            bucket = self.buckets[key]
+            del bucket[word]
+            if not bucket:
+                del self.buckets[key]
+
+    def partners(self, word: Word,
+                 contrasts: set[int] | None = None) -> list[tuple[Word, int]]:
+        """
+        Return every word in the index that forms a minimal pair with `word`,
+        along with the verdict, in the order they were added. Only the
+        `contrasts` given are looked for, by default those kept by the
+        generator. `word` itself doesn't have to be in the index.
+        """
+        if contrasts is None:
+            contrasts = self.generator.kept_contrasts()
+        if not word.phonology:
+            return []
+
+        keys = []
+        if PHONEME_MINPAIR in contrasts:
+            keys += phoneme_keys(word)
+        if CHRONEME_MINPAIR in contrasts or STRESS_MINPAIR in contrasts:
+            keys.append(sounds_key(word))
+        if INDEL_MINPAIR in contrasts and self.generator.keep_indels:
+            # the words that are this one with a sound left out, and those
+            # that this one is with a sound left out
+            keys += [("sequence", deletion) for deletion in deletions(word)]
+            keys.append(("deletion", tuple(word_sounds(word))))
+        candidates = set()
+        for key in keys:
+            candidates.update(self.buckets.get(key, ()))
+        candidates.discard(word)
+
+        partners = []
+        for other in sorted(candidates, key=self.added.__getitem__):
+            verdict = self.generator.check_minpair((word, other), contrasts)
+            if verdict != NOT_MINPAIR:
+                partners.append((other, verdict))
+        return partners
+
+    def keys(self, word: Word) -> set[tuple]:
+        """Return the keys under which `word` is filed"""
+        keys = set(phoneme_keys(word))
+        keys.add(sounds_key(word))
+        if self.generator.keep_indels:
+            keys.add(("sequence", tuple(word_sounds(word))))
+            keys.update(("deletion", deletion) for deletion in deletions(word))
+        return keys
+
 ### Helper functions ###
 
+def word_shape(word: Word) -> tuple[int]:
+    """
+    Return the number of phones in every syllable of the word. All contrasts
+    require both words to have the same number of syllables, and the same
+    number of phones in each, so only words of the same shape can form minimal
+    pairs.
+    """
+    return tuple(len(syllable.contents) for syllable in word.phonology)
+
+def word_sounds(word: Word) -> list[str]:
+    return [phone.sound for syllable in word.phonology for phone in syllable.contents]
+
+def phoneme_keys(word: Word) -> list[tuple]:
+    """
+    Return the keys under which `word` is filed for phoneme contrasts: its
+    shape, along with its sounds with each position left out in turn
+    """
+    shape = word_shape(word)
+    sounds = word_sounds(word)
+    return [("phoneme", shape, i, tuple(sounds[:i] + sounds[i+1:]))
+            for i in range(0, len(sounds))]
+
+def deletions(word: Word) -> list[tuple[str]]:
+    """Return the word's sounds with each one left out in turn"""
+    sounds = word_sounds(word)
+    return [tuple(sounds[:i] + sounds[i+1:]) for i in range(0, len(sounds))]
+
+def sounds_key(word: Word) -> tuple:
+    """Return the key under which `word` is filed for chroneme and stress contrasts"""
+    return ("sounds", word_shape(word), tuple(word_sounds(word)))
+
+def phone_text(phone: Phone) -> str:
+    return phone.sound + ("ː" if phone.long else "")
+
+def phone_differences(pair: WordPair, sounds_only: bool = False) -> list[tuple[str, str]]:
+    """
+    Return the pairs of phones that differ between two words of the same
+    `word_shape()`; if `sounds_only` is True, phones that only differ in
+    length are left out
+    """
+    diffs = []
+    for (syl1, syl2) in zip(pair[0].phonology, pair[1].phonology):
+        for (phone1, phone2) in zip(syl1.contents, syl2.contents):
+            if phone1.sound != phone2.sound or (not sounds_only and phone1 != phone2):
+                diffs.append((phone_text(phone1), phone_text(phone2)))
+    return diffs
+
+def indel_differences(pair: WordPair) -> list[tuple[str, str]]:
+    """
+    Return the phone that one word has and the other doesn't, as a pair with
+    an empty string on the side of the word that doesn't have it
+    """
+    phones = [[phone for syllable in word.phonology for phone in syllable.contents]
+              for word in pair]
+    (longer, shorter) = (0, 1) if len(phones[0]) > len(phones[1]) else (1, 0)
+    i = 0
+    while i < len(phones[shorter]) and phones[longer][i].sound == phones[shorter][i].sound:
+        i += 1
+    diff = ["", ""]
+    diff[longer] = phone_text(phones[longer][i])
+    return [tuple(diff)]
+
+def stress_differences(pair: WordPair) -> list[tuple[str, str]]:
+    """
+    Return the pairs of stress marks that differ between the syllables of two
+    words with the same number of syllables
+    """
+    return [(syl1.stress, syl2.stress)
+            for (syl1, syl2) in zip(pair[0].phonology, pair[1].phonology)
+            if syl1.stress != syl2.stress]
+
+def contrast_differences(pair: WordPair, verdict: int) -> list[tuple[str, str]]:
+    """Return what differs between the two words, given the pair's verdict"""
+    if verdict == STRESS_MINPAIR:
+        return stress_differences(pair)
+    elif verdict == INDEL_MINPAIR:
+        return indel_differences(pair)
+    elif verdict == PHONEME_MINPAIR:
+        # a difference in length as well doesn't make another contrast
+        return phone_differences(pair, True)
+    elif verdict != NOT_MINPAIR:
+        return phone_differences(pair)
+    return []
+
 def flatten(lst: list[list]) -> set[list]:
     """Return the set of all elements belonging to the sublists of the list"""
     return set(chain(*lst))
@@ -0,0 +1,147 @@
+# Copyright (c) 2026 xylous <xylous.e@gmail.com>
+#
+# This file is part of grzegorz.
+# grzegorz is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# grzegorz is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# grzegorz.  If not, see <https://www.gnu.org/licenses/>.
+
+from grzegorz.fetcher import wiktionary_language
+from grzegorz.io import open_compressed
+from grzegorz.pipeline import chunks
+
+import json
+import re
+from multiprocessing import Pool
+from typing import Iterator
+from xml.etree.ElementTree import iterparse
+
+"""How many dump entries are handed to a worker process at once"""
+INGEST_CHUNK_SIZE = 1000
+
+def ingest_dump(path: str, language: str, words: set[str],
+                numproc: int) -> Iterator[tuple[str, str]]:
+    """
+    Stream the locally stored Wiktionary dump at `path` and yield a `(word,
+    ipa)` tuple for every entry in `language` whose title is in `words`.
+    Both MediaWiki XML dumps and Wiktextract JSONL extracts are understood,
+    compressed or not; which one it is depends on the extension of `path`.
+
+    Only the search for IPAs in the entries is spread across `numproc`
+    processes. Decompressing the dump and splitting it into entries, which for
+    XML dumps means parsing the XML, happens in this process, and is usually
+    what takes the longest.
+    """
+    if is_xml_dump(path):
+        entries = xml_dump_pages(path, words)
+        parse = parse_wikitext_chunk
+    else:
+        entries = jsonl_dump_lines(path)
+        parse = parse_jsonl_chunk
+
+    with Pool(numproc, initializer=init_ingest_worker,
+              initargs=(wiktionary_language(language), words)) as p:
+        for found in p.imap(parse, chunks(entries, INGEST_CHUNK_SIZE)):
+            yield from found
+
+### HELPER FUNCTIONS ###
+
+def is_xml_dump(path: str) -> bool:
+    return re.search(r"\.xml(\.(gz|bz2|xz))?$", path) is not None
+
+def xml_dump_pages(path: str, words: set[str]) -> Iterator[tuple[str, str]]:
+    """
+    Yield the `(title, wikitext)` of the pages in the XML dump whose titles are
+    in `words`. Other pages are dropped right away, without ever reaching the
+    worker processes.
+    """
+    with open_compressed(path, 'rb') as f:
+        title = None
+        text = None
+        context = iterparse(f, events=('start', 'end'))
+        (_, root) = next(context)
+        for (event, elem) in context:
+            if event != 'end':
+                continue
+            # dumps are namespaced, e.g. `{http://www.mediawiki.org/xml/export-0.10/}page`
+            tag = elem.tag.rsplit('}', 1)[-1]
+            if tag == 'title':
+                title = elem.text
+            elif tag == 'text':
+                text = elem.text
+            elif tag == 'page':
+                if title in words and text:
+                    yield (title, text)
+                title = None
+                text = None
+                # don't keep the entire dump in memory
+                root.clear()
+
+def jsonl_dump_lines(path: str) -> Iterator[str]:
+    with open_compressed(path, 'rt') as f:
+        yield from f
+
+### WORKER PROCESSES ###
+
+_language = ""
+_words = set()
+
+def init_ingest_worker(language: str, words: set[str]) -> None:
+    global _language, _words
+    _language = language
+    _words = words
+
+def parse_wikitext_chunk(pages: list[tuple[str, str]]) -> list[tuple[str, str]]:
+    found = []
+    for (title, text) in pages:
+        ipa = wikitext_ipa(text, _language)
+        if ipa:
+            found.append((title, ipa))
+    return found
+
+def parse_jsonl_chunk(lines: list[str]) -> list[tuple[str, str]]:
+    found = []
+    for line in lines:
+        # cheap check before decoding a line that isn't about one of our words
+        if f'"{_language}"' not in line:
+            continue
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if entry.get("lang") != _language or entry.get("word") not in _words:
+            continue
+        for sound in entry.get("sounds", []):
+            if sound.get("ipa"):
+                found.append((entry["word"], sound["ipa"]))
+                break
+    return found
+
+def wikitext_ipa(text: str, language: str) -> str:
+    """
+    Return the first IPA transcription in the `language` section of a
+    Wiktionary page's wikitext, or an empty string if there is none. NOTE:
+    pronunciations generated by language-specific templates (e.g. `{{pl-p}}`)
+    can't be expanded without MediaWiki, and so aren't found.
+    """
+    heading = re.search(r"^==\s*" + re.escape(language) + r"\s*==\s*$", text, re.MULTILINE)
+    if heading is None:
+        return ""
+    section = text[heading.end():]
+    next_heading = re.search(r"^==[^=]", section, re.MULTILINE)
+    if next_heading is not None:
+        section = section[:next_heading.start()]
+
+    for template in re.findall(r"\{\{IPA\|([^}]*)\}\}", section):
+        for arg in template.split("|"):
+            arg = arg.strip()
+            if "=" not in arg and arg[:1] in ("/", "["):
+                return arg
+    return ""
@@ -0,0 +1,163 @@
+# Copyright (c) 2026 xylous <xylous.e@gmail.com>
+#
+# This file is part of grzegorz.
+# grzegorz is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# grzegorz is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# grzegorz.  If not, see <https://www.gnu.org/licenses/>.
+
+from collections import Counter
+from contextlib import contextmanager
+from math import ceil
+from os import makedirs
+from os.path import join
+from time import perf_counter
+from typing import Iterator
+
+class Stage:
+    """How long a step of a command took, and how many items it went through"""
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.items = 0
+        self.seconds = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "seconds": round(self.seconds, 6),
+            "items": self.items,
+            "items_per_second": round(self.items / self.seconds, 3) if self.seconds else None,
+        }
+
+class Report:
+    """
+    What happened during a run: the time every stage took, fetch latencies,
+    and counters, such as why the generator rejected pairs of words. If
+    `profile_dir` isn't None, every stage is also profiled with cProfile, and
+    the statistics dumped into `<profile_dir>/<stage>.prof`.
+    """
+    def __init__(self, profile_dir: str | None = None) -> None:
+        self.started = perf_counter()
+        self.profile_dir = profile_dir
+        self.stages = []
+        self.counters = Counter()
+        self.rejections = Counter()
+        self.latencies = []
+        # put before the name of every stage, see `stage_prefix()`
+        self.prefix = ""
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[Stage]:
+        name = self.prefix + name
+        stage = Stage(name)
+        self.stages.append(stage)
+        profiler = None
+        if self.profile_dir is not None:
+            from cProfile import Profile
+            profiler = Profile()
+            profiler.enable()
+        start = perf_counter()
+        try:
+            yield stage
+        finally:
+            stage.seconds = perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                makedirs(self.profile_dir, exist_ok=True)
+                profiler.dump_stats(join(self.profile_dir, name + ".prof"))
+
+    def merge(self, other: "Report") -> None:
+        """Add what `other` measured, e.g. in a worker process, to this report"""
+        self.stages += other.stages
+        self.counters.update(other.counters)
+        self.rejections.update(other.rejections)
+        self.latencies += other.latencies
+
+    def as_dict(self) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            "seconds": round(perf_counter() - self.started, 6),
+            "stages": [stage.as_dict() for stage in self.stages],
+            "fetch_latency": {
+                "count": len(latencies),
+                "mean": round(sum(latencies) / len(latencies), 6) if latencies else None,
+                "p50": percentile(latencies, 50),
+                "p90": percentile(latencies, 90),
+                "p99": percentile(latencies, 99),
+                "max": latencies[-1] if latencies else None,
+            },
+            "counters": dict(self.counters),
+            "rejections": dict(self.rejections),
+        }
+
+    def write(self, path: str) -> None:
+        import json
+        with open(path, "w", encoding='utf-8') as f:
+            json.dump(self.as_dict(), f, indent=4, ensure_ascii=False)
+            f.write("\n")
+
+"""The report of the current run, or None if nothing is being measured"""
+_report = None
+
+def start_report(profile_dir: str | None = None) -> Report:
+    """Start measuring the current run"""
+    global _report
+    _report = Report(profile_dir)
+    return _report
+
+def current_report() -> Report | None:
+    return _report
+
+@contextmanager
+def stage(name: str) -> Iterator[Stage]:
+    """
+    Measure the code run inside the `with` block as the stage `name`; the
+    caller may set the `items` attribute of the yielded `Stage`. When nothing
+    is being measured, this costs no more than entering the `with` block.
+    """
+    if _report is None:
+        yield Stage(name)
+        return
+    with _report.stage(name) as measured:
+        yield measured
+
+@contextmanager
+def stage_prefix(prefix: str) -> Iterator[None]:
+    """
+    Put `prefix` before the names of the stages measured inside the `with`
+    block, so that the stages of the same command run several times, e.g. once
+    per language, aren't mixed up, and don't overwrite each other's profiles
+    """
+    if _report is None:
+        yield
+        return
+    previous = _report.prefix
+    _report.prefix = previous + prefix
+    try:
+        yield
+    finally:
+        _report.prefix = previous
+
+def count(name: str, n: int = 1) -> None:
+    if _report is not None:
+        _report.counters[name] += n
+
+def record_latency(seconds: float) -> None:
+    if _report is not None:
+        _report.latencies.append(seconds)
+
+### HELPER FUNCTIONS ###
+
+def percentile(values: list[float], p: float) -> float | None:
+    """Return the `p`-th percentile of the sorted `values`, by nearest rank"""
+    if not values:
+        return None
+    rank = max(1, ceil(len(values) * p / 100))
+    return values[rank - 1]
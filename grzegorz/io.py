@@ -15,10 +15,23 @@
 
 from grzegorz.word import (Word, WordPair)
 
+import bz2
+import gzip
+import lzma
+from os import fsync
+from os.path import exists
+from queue import (Queue, Empty)
+from threading import Thread
+from time import monotonic
 from typing import Callable, TypeVar
 
 T = TypeVar('T')
 
+"""After how many words `fetchipa` writes its output to disk, at the latest"""
+DEFAULT_FLUSH_EVERY = 100
+"""After how many seconds `fetchipa` writes its output to disk, at the latest"""
+DEFAULT_FLUSH_INTERVAL = 1.0
+
 def readfile(path: str) -> str:
     """Return the contents of a file"""
     with open(path, 'r', encoding='utf-8') as f:
@@ -29,23 +42,177 @@ def writefile(path: str, text: str) -> None:
     with open(path, 'w', encoding='utf-8') as f:
         f.write(text)
 
+def open_compressed(path: str, mode: str = 'rt'):
+    """
+    Open the file at `path`, transparently decompressing it if its extension
+    says it's gzip, bzip2 or xz compressed
+    """
+    encoding = 'utf-8' if 't' in mode else None
+    if path.endswith(".gz"):
+        return gzip.open(path, mode, encoding=encoding)
+    elif path.endswith(".bz2"):
+        return bz2.open(path, mode, encoding=encoding)
+    elif path.endswith(".xz"):
+        return lzma.open(path, mode, encoding=encoding)
+    else:
+        return open(path, mode, encoding=encoding)
+
+def checkpoint_path(outfile: str) -> str:
+    """Return the path of the checkpoint file that accompanies `outfile`"""
+    return outfile + ".checkpoint"
+
+class CheckpointedWriter:
+    """
+    Append the entries of `fetchipa` to its output file, and the words it has
+    dealt with to its checkpoint file, from a thread of its own. Words are
+    written in batches, once `flush_every` of them are waiting, or once the
+    first of them has waited for `flush_interval` seconds, whichever comes
+    first; every batch is then synced to disk, the output file before the
+    checkpoint file, so that a word is never in the checkpoint file without
+    its entry being in the output file. A crash thus loses at most one batch,
+    which is fetched again by the next run.
+
+    A line left half-written by a crash is removed from either file when it's
+    opened again.
+    """
+    def __init__(self, outfile: str, flush_every: int = DEFAULT_FLUSH_EVERY,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL) -> None:
+        self.flush_every = max(1, flush_every)
+        self.flush_interval = flush_interval
+        repair_partial_line(outfile)
+        repair_partial_line(checkpoint_path(outfile))
+        self.handle = open(outfile, "a", encoding='utf-8')
+        self.checkpoint = open(checkpoint_path(outfile), "a", encoding='utf-8')
+        self.queue = Queue()
+        self.error = None
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def __enter__(self) -> 'CheckpointedWriter':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def write(self, word: str, entry: str | None) -> None:
+        """
+        Record that `word` has been dealt with, and, unless it's None, append
+        `entry` to the output file
+        """
+        if self.error is not None:
+            raise self.error
+        self.queue.put((word, entry))
+
+    def close(self) -> None:
+        """Write the words still waiting, and close both files"""
+        self.queue.put(None)
+        self.thread.join()
+        self.handle.close()
+        self.checkpoint.close()
+        if self.error is not None:
+            raise self.error
+
+    def run(self) -> None:
+        batch = []
+        deadline = 0.0
+        while True:
+            try:
+                timeout = max(0.0, deadline - monotonic()) if batch else None
+                item = self.queue.get(timeout=timeout)
+            except Empty:
+                self.flush(batch)
+                batch = []
+                continue
+            if item is None:
+                self.flush(batch)
+                return
+            if not batch:
+                deadline = monotonic() + self.flush_interval
+            batch.append(item)
+            if len(batch) >= self.flush_every:
+                self.flush(batch)
+                batch = []
+
+    def flush(self, batch: list[tuple[str, str | None]]) -> None:
+        if not batch or self.error is not None:
+            return
+        try:
+            self.handle.write("".join(entry + "\n" for (_, entry) in batch if entry is not None))
+            self.handle.flush()
+            fsync(self.handle.fileno())
+            self.checkpoint.write("".join(word + "\n" for (word, _) in batch))
+            self.checkpoint.flush()
+            fsync(self.checkpoint.fileno())
+        except OSError as err:
+            # raised in the thread that writes, or closes, next
+            self.error = err
+
+def repair_partial_line(path: str) -> None:
+    """If the file at `path` doesn't end in a newline, cut off its last line"""
+    if not exists(path):
+        return
+    with open(path, "rb+") as f:
+        end = f.seek(0, 2)
+        position = end
+        while position > 0:
+            size = min(4096, position)
+            f.seek(position - size)
+            block = f.read(size)
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                position = position - size + newline + 1
+                break
+            position -= size
+        if position != end:
+            f.truncate(position)
+
+def read_fetched_words(outfile: str) -> set[str]:
+    """
+    Return the set of words that a previous `fetchipa` run into `outfile` has
+    already taken care of: those written to the output file itself, and those
+    recorded in its checkpoint file, which also holds the words whose IPA
+    wasn't found.
+    """
+    fetched = set()
+    if exists(outfile):
+        for line in readfile(outfile).splitlines():
+            if line:
+                fetched.add(line.split(GRZEGORZ_WORD_FORMAT_SEPARATOR)[0])
+    if exists(checkpoint_path(outfile)):
+        for line in readfile(checkpoint_path(outfile)).splitlines():
+            if line:
+                fetched.add(line)
+    return fetched
+
 
 # JSON has several disadvantages, alongside being too verbose for our purposes.
 # Running multiple threads, like `fetchipa()` does, would make it tricky to
-# add new data to the file. On the other hand, using plain text and a thread
-# mutex allows us to directly append new lines.
+# add new data to the file. With plain text, new lines can be appended
+# directly: the fetching threads hand their entries to a `CheckpointedWriter`,
+# whose own thread is the only one writing to the output and checkpoint files,
+# and which appends them in batches, each fsync'd to the output file before
+# the words are recorded in the checkpoint file.
 
 GRZEGORZ_WORD_FORMAT_SEPARATOR = ", "
 GRZEGORZ_MINPAIR_FORMAT_SEPARATOR = " -- "
 
 def encode_word(word: Word) -> str:
-    return word.text + GRZEGORZ_WORD_FORMAT_SEPARATOR + word.ipa
+    encoded = word.text + GRZEGORZ_WORD_FORMAT_SEPARATOR + word.ipa
+    if word.rank is not None:
+        encoded += GRZEGORZ_WORD_FORMAT_SEPARATOR + str(word.rank)
+    return encoded
 
 def encode_minpair(pair: WordPair) -> str:
-    return encode_word(pair[0]) + GRZEGORZ_MINPAIR_FORMAT_SEPARATOR + encode_word(pair[1])
+    # the words of a minimal pair are written without their ranks
+    return pair[0].text + GRZEGORZ_WORD_FORMAT_SEPARATOR + pair[0].ipa \
+            + GRZEGORZ_MINPAIR_FORMAT_SEPARATOR \
+            + pair[1].text + GRZEGORZ_WORD_FORMAT_SEPARATOR + pair[1].ipa
 
 def decode_word(s: str) -> Word:
     spl = s.split(GRZEGORZ_WORD_FORMAT_SEPARATOR)
+    # the frequency rank is optional, and only written by newer versions
+    if len(spl) > 2 and spl[2].isdigit():
+        return Word(spl[0], spl[1], int(spl[2]))
     return Word(spl[0], spl[1])
 
 def decode_minpair(s: str) -> WordPair:
@@ -0,0 +1,125 @@
+# Copyright (c) 2026 xylous <xylous.e@gmail.com>
+#
+# This file is part of grzegorz.
+# grzegorz is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# grzegorz is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# grzegorz.  If not, see <https://www.gnu.org/licenses/>.
+
+from itertools import (chain, islice)
+from queue import Queue
+from threading import Thread
+from typing import Callable, Iterable, Iterator, TypeVar
+
+R = TypeVar('R')
+T = TypeVar('T')
+
+"""How many items may wait between two stages of a pipeline"""
+PIPELINE_QUEUE_SIZE = 1024
+
+def run_pipeline(
+    source: Iterable,
+    stages: list[Callable[[Iterator], Iterable]],
+    sink: Callable[[Iterator], R],
+    maxsize: int = PIPELINE_QUEUE_SIZE,
+) -> R:
+    """
+    Run every stage in its own thread, so that they all work at the same time:
+    `source` is iterated over, and every item it yields goes through each of
+    the `stages` in turn, each of which turns an iterator of inputs into an
+    iterable of outputs, and finally into `sink`, whose result is returned.
+    Stages are connected by queues of at most `maxsize` items, so a fast stage
+    waits for a slow one instead of piling up its output in memory.
+
+    If any stage raises an exception, it's raised again here.
+    """
+    queue = Queue(maxsize)
+    feed(source, queue)
+    for stage in stages:
+        next_queue = Queue(maxsize)
+        feed(StageInput(queue, stage), next_queue)
+        queue = next_queue
+    return sink(drain(queue))
+
+def map_chunked(
+    hook: Callable[[list], R],
+    items: Iterable,
+    numproc: int,
+    chunk_size: int = 1000,
+) -> Iterator[R]:
+    """
+    Yield `hook(chunk)` for every chunk of `chunk_size` items, in order. If
+    there's more than one chunk, they're spread across `numproc` processes;
+    otherwise, starting a process pool isn't worth it. `hook` must be picklable,
+    i.e. a module-level function.
+    """
+    it = chunks(items, chunk_size)
+    first = next(it, None)
+    if first is None:
+        return
+    second = next(it, None)
+    if second is None or numproc <= 1:
+        yield hook(first)
+        if second is not None:
+            yield hook(second)
+            yield from map(hook, it)
+        return
+
+    from multiprocessing import Pool
+    with Pool(numproc) as p:
+        yield from p.imap(hook, chain([first, second], it))
+
+def chunks(xs: Iterable[T], size: int) -> Iterator[list[T]]:
+    """Split the iterable into lists of `size` elements (the last may be shorter)"""
+    it = iter(xs)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+### HELPER FUNCTIONS ###
+
+class StageFailed:
+    """Passed down the pipeline instead of an item when a stage fails"""
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+_END = object()
+
+class StageInput:
+    """Iterate over the output of `stage` applied to the contents of `queue`"""
+    def __init__(self, queue: Queue, stage: Callable[[Iterator], Iterable]) -> None:
+        self.queue = queue
+        self.stage = stage
+
+    def __iter__(self) -> Iterator:
+        return iter(self.stage(drain(self.queue)))
+
+def feed(items: Iterable, queue: Queue) -> None:
+    """Put all the items into the queue, from a new thread"""
+    def run() -> None:
+        try:
+            for item in items:
+                queue.put(item)
+        except BaseException as err:
+            queue.put(StageFailed(err))
+            return
+        queue.put(_END)
+    # daemon threads, so that a failing stage can't keep the program alive by
+    # waiting on a queue nobody reads anymore
+    Thread(target=run, daemon=True).start()
+
+def drain(queue: Queue) -> Iterator:
+    """Yield the items put into the queue, until it's marked as done"""
+    while True:
+        item = queue.get()
+        if item is _END:
+            return
+        if isinstance(item, StageFailed):
+            raise item.error
+        yield item
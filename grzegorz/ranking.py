@@ -0,0 +1,77 @@
+# Copyright (c) 2026 xylous <xylous.e@gmail.com>
+#
+# This file is part of grzegorz.
+# grzegorz is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# grzegorz is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# grzegorz.  If not, see <https://www.gnu.org/licenses/>.
+
+from grzegorz.generator import (MinPairGenerator, MinPairIndex, contrast_differences)
+from grzegorz.word import (Word, WordPair)
+
+def top_minpairs(g: MinPairGenerator, words: list[Word], k: int,
+                 contrast_quota: int | None = None,
+                 pair_quota: int | None = None) -> list[WordPair]:
+    """
+    Return the `k` most useful minimal pairs among the words, most useful
+    first. A minimal pair is only as useful as its less frequent word, so
+    pairs are ranked by the rank of that word, and then by the rank of the
+    other. Words without a rank are ranked by their position in `words`,
+    after all ranked words.
+
+    At most `contrast_quota` pairs of every kind (phoneme, chroneme, ...) and
+    `pair_quota` pairs of every two sounds (e.g. /ɕ/ and /ʂ/) are kept, if they
+    aren't None, so that no contrast takes up all of the `k` pairs.
+
+    The words are indexed from the most frequent to the least frequent. The
+    minimal pairs a word forms with the words indexed before it are therefore
+    all less useful than those found earlier, and no more than `k` pairs are
+    ever kept: once there are `k`, no word left can make it in, and the rest
+    aren't even looked at.
+    """
+    positions = {id(word): i for (i, word) in enumerate(words)}
+    ranked = sorted((word for word in words if word.phonology),
+                    key=lambda word: (0, word.rank) if word.rank is not None
+                                     else (1, positions[id(word)]))
+    index = MinPairIndex(g)
+    minpairs = []
+    per_contrast = {}
+    per_sounds = {}
+    for word in ranked:
+        if len(minpairs) >= k:
+            break
+        # partners come in the order they were indexed, i.e. most frequent first
+        for (other, verdict) in index.partners(word):
+            pair = (other, word)
+            sounds = sounds_contrasted(pair, verdict)
+            if contrast_quota is not None and per_contrast.get(verdict, 0) >= contrast_quota:
+                continue
+            if pair_quota is not None and per_sounds.get(sounds, 0) >= pair_quota:
+                continue
+            per_contrast[verdict] = per_contrast.get(verdict, 0) + 1
+            per_sounds[sounds] = per_sounds.get(sounds, 0) + 1
+            minpairs.append(pair)
+            if g.stats is not None:
+                g.stats.add(pair, verdict)
+            if len(minpairs) >= k:
+                break
+        index.add(word)
+    return minpairs
+
+### HELPER FUNCTIONS ###
+
+def sounds_contrasted(pair: WordPair, verdict: int) -> tuple:
+    """
+    Return what makes the pair a minimal pair, regardless of which word comes
+    first, e.g. `(PHONEME_MINPAIR, (("ɕ", "ʂ"),))` for the contrast of /ɕ/
+    and /ʂ/
+    """
+    return (verdict, tuple(sorted(tuple(sorted(diff))
+                                  for diff in contrast_differences(pair, verdict))))
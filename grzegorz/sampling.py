@@ -0,0 +1,128 @@
+# Copyright (c) 2026 xylous <xylous.e@gmail.com>
+#
+# This file is part of grzegorz.
+# grzegorz is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# grzegorz is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# grzegorz.  If not, see <https://www.gnu.org/licenses/>.
+
+from grzegorz.generator import (MinPairGenerator, word_shape)
+from grzegorz.word import (Word, NOT_MINPAIR)
+
+from bisect import bisect_right
+from itertools import accumulate
+from math import sqrt
+from random import Random
+from time import monotonic
+
+"""How many minimal pairs a sample keeps, by default"""
+DEFAULT_SAMPLE_SIZE = 100
+"""For how many seconds pairs of words are sampled, by default"""
+DEFAULT_TIME_BUDGET = 30.0
+
+class PairSample:
+    """
+    The outcome of comparing randomly chosen pairs of words: how many pairs
+    were drawn, with replacement, out of how many there are, how many of the
+    draws were minimal pairs of every kind, and a uniform sample of those
+    minimal pairs
+    """
+    def __init__(self, space: int) -> None:
+        self.space = space
+        self.comparisons = 0
+        self.counts = {}
+        self.reservoir = []
+        self.seconds = 0.0
+
+    def estimate(self, verdict: int, z: float = 1.96) -> tuple[float, float, float]:
+        """
+        Return the estimated number of minimal pairs with the given verdict
+        that a full run would find, along with the lower and upper bounds of
+        its confidence interval (by default, 95%)
+        """
+        k = self.counts.get(verdict, 0)
+        if self.comparisons == 0:
+            return (0.0, 0.0, float(self.space))
+        (low, high) = wilson_interval(k, self.comparisons, z)
+        return (self.space * k / self.comparisons, self.space * low, self.space * high)
+
+def sample_minpairs(g: MinPairGenerator, words: list[Word],
+                    size: int = DEFAULT_SAMPLE_SIZE,
+                    time_budget: float = DEFAULT_TIME_BUDGET,
+                    rng: Random | None = None) -> PairSample:
+    """
+    Compare randomly chosen pairs of words for `time_budget` seconds, and keep
+    a uniform sample of `size` of the minimal pairs found. Only words of the
+    same `word_shape()` are compared, since no other pair of words can be a
+    minimal pair; a pair of words is picked by first picking a shape, in
+    proportion to how many pairs of words of that shape there are, and then
+    two different words of that shape. Sampling also stops after as many
+    comparisons as a full run would make.
+    """
+    rng = rng or Random()
+    buckets = {}
+    for word in words:
+        if word.phonology:
+            buckets.setdefault(word_shape(word), []).append(word)
+    buckets = [bucket for bucket in buckets.values() if len(bucket) > 1]
+    weights = list(accumulate(len(b) * (len(b) - 1) // 2 for b in buckets))
+    sample = PairSample(weights[-1] if weights else 0)
+    if sample.space == 0:
+        return sample
+
+    start = monotonic()
+    deadline = start + time_budget
+    # pairs in the reservoir, so that a pair drawn twice isn't kept twice
+    kept = set()
+    found = 0
+    while sample.comparisons < sample.space:
+        # don't look at the clock for every comparison
+        if sample.comparisons % 1000 == 0 and monotonic() >= deadline:
+            break
+        bucket = buckets[bisect_right(weights, rng.randrange(sample.space))]
+        (i, j) = rng.sample(range(len(bucket)), 2)
+        pair = (bucket[min(i, j)], bucket[max(i, j)])
+        verdict = g.check_minpair(pair)
+        sample.comparisons += 1
+        if verdict == NOT_MINPAIR:
+            continue
+        sample.counts[verdict] = sample.counts.get(verdict, 0) + 1
+        key = (id(pair[0]), id(pair[1]))
+        if key in kept:
+            continue
+        # reservoir sampling: the n-th minimal pair found replaces a random
+        # one with probability size/n
+        found += 1
+        if len(sample.reservoir) < size:
+            sample.reservoir.append(pair)
+            kept.add(key)
+        else:
+            r = rng.randrange(found)
+            if r < size:
+                old = sample.reservoir[r]
+                kept.discard((id(old[0]), id(old[1])))
+                sample.reservoir[r] = pair
+                kept.add(key)
+    sample.seconds = monotonic() - start
+    return sample
+
+### HELPER FUNCTIONS ###
+
+def wilson_interval(k: int, n: int, z: float = 1.96) -> tuple[float, float]:
+    """
+    Return the Wilson score interval of a proportion of `k` successes out of
+    `n` trials; unlike the usual `p ± z·√(p(1-p)/n)`, it stays meaningful
+    when there are few or no successes
+    """
+    p = k / n
+    denominator = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denominator
+    margin = z * sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return (max(0.0, centre - margin), min(1.0, centre + margin))
@@ -0,0 +1,192 @@
+# Copyright (c) 2026 xylous <xylous.e@gmail.com>
+#
+# This file is part of grzegorz.
+# grzegorz is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# grzegorz is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# grzegorz.  If not, see <https://www.gnu.org/licenses/>.
+
+from grzegorz.fetcher import (FetchResult, fetch_word)
+
+from collections import deque
+from heapq import (heappush, heappop)
+from multiprocessing.pool import Pool
+from queue import (Queue, Empty)
+from random import uniform
+from time import monotonic
+from typing import Iterable, Iterator
+
+class AIMDController:
+    """
+    Decide how many requests may be in flight at once. As long as requests
+    succeed quickly, the window grows by one for every window's worth of
+    successes (additive increase); whenever the server pushes back, or answers
+    too slowly, the window shrinks by a constant factor (multiplicative
+    decrease).
+    """
+    def __init__(
+        self,
+        maximum: int,
+        initial: int = 4,
+        minimum: int = 1,
+        decrease_factor: float = 0.5,
+        slow_factor: float = 4.0,
+        slow_floor: float = 2.0,
+    ) -> None:
+        self.maximum = max(1, maximum)
+        self.minimum = min(max(1, minimum), self.maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.peak = self.window
+        self.decrease_factor = decrease_factor
+        # a response is considered slow if it took `slow_factor` times longer
+        # than the fastest one so far, and at least `slow_floor` seconds
+        self.slow_factor = slow_factor
+        self.slow_floor = slow_floor
+        self.fastest = None
+        self.last_decrease = 0.0
+
+    @property
+    def window(self) -> int:
+        """The number of requests that may currently be in flight"""
+        return int(self.limit)
+
+    def on_success(self, latency: float) -> None:
+        if self.fastest is None or latency < self.fastest:
+            self.fastest = latency
+        if latency > max(self.slow_floor, self.slow_factor * self.fastest):
+            self.decrease(latency)
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.peak = max(self.peak, self.window)
+
+    def on_failure(self, latency: float) -> None:
+        self.decrease(latency)
+
+    def decrease(self, latency: float) -> None:
+        # requests that were already in flight when we backed off report the
+        # same congestion again; only react once per round trip
+        now = monotonic()
+        if now - self.last_decrease < latency:
+            return
+        self.last_decrease = now
+        self.limit = max(self.minimum, self.limit * self.decrease_factor)
+
+class FetchStats:
+    """What happened while fetching, as shown to the user at the end of a run"""
+    def __init__(self) -> None:
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = []
+        self.peak_window = 0
+        self.final_window = 0
+
+    def summary(self) -> str:
+        text = (f"{self.requests} requests, {self.retries} retries, "
+                + f"{self.throttled} throttled responses, "
+                + f"{len(self.failures)} failures; "
+                + f"concurrency peaked at {self.peak_window} "
+                + f"and settled at {self.final_window}")
+        return text
+
+class FetchScheduler:
+    """
+    Fetch the IPAs of words on a process pool, keeping as many requests in
+    flight as the `AIMDController` allows. Requests that time out or are
+    throttled (HTTP 429 or 5xx) are retried with exponential backoff and
+    jitter, honouring the server's `Retry-After` header; words that still fail
+    after `max_retries` retries are reported as failures, never as words
+    without IPA.
+    """
+    def __init__(
+        self,
+        pool: Pool,
+        controller: AIMDController,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_cap: float = 60.0,
+    ) -> None:
+        self.pool = pool
+        self.controller = controller
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.stats = FetchStats()
+
+    def backoff(self, attempt: int, retry_after: float | None) -> float:
+        """Return how long to wait before retrying for the `attempt`-th time"""
+        if retry_after is not None:
+            return retry_after + uniform(0, self.backoff_base)
+        # "full jitter": spread retries out evenly, so that they don't all hit
+        # the server at the same time again
+        return uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def run(self, tasks: Iterable[tuple]) -> Iterator[FetchResult]:
+        """
+        Fetch every task, i.e. a tuple of arguments to `fetch_word()`, such as
+        `(word, language)`, and yield the results as they come, in no
+        particular order. Results with a non-empty `error` field are words that
+        could not be fetched at all.
+        """
+        pending = deque((args, 0) for args in tasks)
+        delayed = [] # heap of (ready time, sequence number, task)
+        sequence = 0
+        inflight = 0
+        paused_until = 0.0
+        results = Queue()
+
+        while pending or delayed or inflight:
+            now = monotonic()
+            while delayed and delayed[0][0] <= now:
+                pending.append(heappop(delayed)[2])
+            while pending and inflight < self.controller.window and now >= paused_until:
+                task = pending.popleft()
+                self.pool.apply_async(fetch_word, task[0],
+                    callback=lambda result, task=task: results.put((task, result)),
+                    error_callback=lambda err, task=task:
+                        results.put((task, FetchResult(task[0][0], None, 0.0, repr(err)))))
+                inflight += 1
+                self.stats.requests += 1
+
+            wakeups = []
+            if delayed:
+                wakeups.append(delayed[0][0])
+            if pending and paused_until > now:
+                wakeups.append(paused_until)
+            timeout = max(0.0, min(wakeups) - now) if wakeups else None
+            try:
+                (task, result) = results.get(timeout=timeout)
+            except Empty:
+                continue
+            inflight -= 1
+
+            (args, attempt) = task
+            if result.error is None:
+                self.controller.on_success(result.latency)
+                yield result
+                continue
+
+            self.controller.on_failure(result.latency)
+            if result.throttled:
+                self.stats.throttled += 1
+            if result.retry_after is not None:
+                # the server asks everyone to wait, not just this request
+                paused_until = max(paused_until, monotonic() + result.retry_after)
+            if attempt < self.max_retries:
+                self.stats.retries += 1
+                sequence += 1
+                ready = monotonic() + self.backoff(attempt, result.retry_after)
+                heappush(delayed, (ready, sequence, (args, attempt + 1)))
+            else:
+                self.stats.failures.append(result.query)
+                yield result
+
+        self.stats.peak_window = self.controller.peak
+        self.stats.final_window = self.controller.window
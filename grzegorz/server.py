@@ -0,0 +1,156 @@
+# Copyright (c) 2026 xylous <xylous.e@gmail.com>
+#
+# This file is part of grzegorz.
+# grzegorz is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# grzegorz is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# grzegorz.  If not, see <https://www.gnu.org/licenses/>.
+
+from grzegorz.generator import (MinPairGenerator, MinPairIndex, contrast_differences)
+from grzegorz.word import (Word, VERDICT_NAMES)
+
+import json
+from http.server import (BaseHTTPRequestHandler, ThreadingHTTPServer)
+from socketserver import ThreadingUnixStreamServer
+from urllib.parse import (urlsplit, parse_qs)
+
+class Lexicon:
+    """
+    A list of words, loaded once and indexed, so that looking up the minimal
+    pairs a word forms with the rest of them is quick
+    """
+    def __init__(self, words: list[Word], generator: MinPairGenerator) -> None:
+        self.by_text = {}
+        for word in words:
+            if word.phonology:
+                self.by_text.setdefault(word.text, word)
+        self.index = MinPairIndex(generator, words)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def partners(self, word: Word) -> list[tuple[Word, int, list[tuple[str, str]]]]:
+        """
+        Return every word of the lexicon that forms a minimal pair with `word`,
+        along with the verdict and the differences
+        """
+        return [(other, verdict, contrast_differences((word, other), verdict))
+                for (other, verdict) in self.index.partners(word)]
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    Answer `GET` requests to:
+
+    - `/analyse?ipa=IPA` - the phonological parse of the IPA
+    - `/check?ipa1=IPA&ipa2=IPA` - whether the two IPAs form a minimal pair
+    - `/partners?word=TEXT` or `/partners?ipa=IPA` - all the words in a lexicon
+        that form a minimal pair with the given word or IPA; if several
+        lexicons are loaded, `lexicon=NAME` chooses which
+    - `/lexicons` - the names and sizes of the loaded lexicons
+
+    Every answer is a JSON object.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        params = {key: values[0] for (key, values) in parse_qs(url.query).items()}
+        try:
+            match url.path:
+                case '/analyse':
+                    self.reply(200, Word("", self.param(params, 'ipa')).as_dict())
+                case '/check':
+                    pair = (Word("", self.param(params, 'ipa1')),
+                            Word("", self.param(params, 'ipa2')))
+                    self.reply(200, verdict_json(*self.server.generator.contrast(pair)))
+                case '/partners':
+                    self.reply(200, self.partners(params))
+                case '/lexicons':
+                    self.reply(200, {name: len(lexicon)
+                                     for (name, lexicon) in self.server.lexicons.items()})
+                case _:
+                    self.reply(404, {"error": "unknown query: " + url.path})
+        except QueryError as err:
+            self.reply(err.status, {"error": str(err)})
+
+    def partners(self, params: dict[str, str]) -> dict:
+        lexicons = self.server.lexicons
+        if 'lexicon' in params:
+            if params['lexicon'] not in lexicons:
+                raise QueryError(404, "no such lexicon: " + params['lexicon'])
+            lexicon = lexicons[params['lexicon']]
+        elif len(lexicons) == 1:
+            lexicon = next(iter(lexicons.values()))
+        else:
+            raise QueryError(400, "several lexicons are loaded; choose one with 'lexicon'")
+
+        if 'word' in params:
+            word = lexicon.by_text.get(params['word'])
+            if word is None:
+                raise QueryError(404, "no such word: " + params['word'])
+        else:
+            word = Word("", self.param(params, 'ipa'))
+        return {
+            "word": {"text": word.text, "ipa": word.ipa},
+            "partners": [{"text": other.text, "ipa": other.ipa} | verdict_json(verdict, diffs)
+                         for (other, verdict, diffs) in lexicon.partners(word)],
+        }
+
+    def param(self, params: dict[str, str], name: str) -> str:
+        if name not in params:
+            raise QueryError(400, "missing parameter: " + name)
+        return params[name]
+
+    def reply(self, status: int, body: dict) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self) -> str:
+        # Unix sockets have no client address
+        return str(self.client_address[0]) if self.client_address else "unix"
+
+    def log_message(self, format: str, *args) -> None:
+        # logging every request would cost more than answering it
+        pass
+
+class QueryError(Exception):
+    """A query that can't be answered, and the HTTP status saying why"""
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+class QueryServer(ThreadingHTTPServer):
+    """Answer queries over TCP, one thread per connection"""
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], lexicons: dict[str, Lexicon],
+                 generator: MinPairGenerator) -> None:
+        super().__init__(address, QueryHandler)
+        self.lexicons = lexicons
+        self.generator = generator
+
+class UnixQueryServer(ThreadingUnixStreamServer):
+    """Answer queries over a Unix socket, one thread per connection"""
+    daemon_threads = True
+
+    def __init__(self, path: str, lexicons: dict[str, Lexicon],
+                 generator: MinPairGenerator) -> None:
+        super().__init__(path, QueryHandler)
+        self.lexicons = lexicons
+        self.generator = generator
+
+### HELPER FUNCTIONS ###
+
+def verdict_json(verdict: int, diffs: list[tuple[str, str]]) -> dict:
+    return {"verdict": VERDICT_NAMES[verdict], "differences": [list(d) for d in diffs]}
@@ -0,0 +1,232 @@
+# Copyright (c) 2026 xylous <xylous.e@gmail.com>
+#
+# This file is part of grzegorz.
+# grzegorz is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# grzegorz is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# grzegorz.  If not, see <https://www.gnu.org/licenses/>.
+
+from grzegorz.generator import (MinPairGenerator, word_shape, word_sounds)
+from grzegorz.word import Word
+
+from array import array
+from collections import Counter
+from mmap import (mmap, ACCESS_READ)
+from operator import ne
+from os.path import join
+from tempfile import TemporaryDirectory
+
+"""Roughly how many pairs of words a worker compares per task"""
+TASK_COMPARISONS = 100_000
+
+class SharedLexicon:
+    """
+    A list of words, written by `write_lexicon()` as flat arrays of integers
+    into a file that every process maps into memory read-only, so that
+    workers share a single copy of it, and never have to unpickle a `Word`.
+    Words are identified by their slot in the file, and the slots are ordered
+    by `word_shape()`.
+
+    The file holds, as 32-bit integers: the number of words, of sounds and of
+    bytes of IPA; the offsets of every word's sounds; the sounds, as ids; the
+    offsets of every word's IPA; the position of every word in the list it
+    was written from; and, finally, the IPAs themselves, encoded in UTF-8.
+    """
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            self.map = mmap(f.fileno(), 0, access=ACCESS_READ)
+        self.view = memoryview(self.map)
+        (numwords, numsounds, numbytes) = self.view[0:12].cast('i')
+        # the IPAs after the integers needn't be a whole number of them
+        numints = 3 + 2 * (numwords + 1) + numsounds + numwords
+        ints = self.view[0:numints * 4].cast('i')
+        start = 3
+        self.sound_offsets = ints[start:start + numwords + 1]
+        start += numwords + 1
+        self.sounds = ints[start:start + numsounds]
+        start += numsounds
+        self.ipa_offsets = ints[start:start + numwords + 1]
+        start += numwords + 1
+        self.positions = ints[start:start + numwords]
+        start += numwords
+        self.ipas = self.view[start * 4:start * 4 + numbytes]
+        self.ints = ints
+        self.numwords = numwords
+
+    def __len__(self) -> int:
+        return self.numwords
+
+    def word_sounds(self, slot: int) -> tuple[int]:
+        return tuple(self.sounds[self.sound_offsets[slot]:self.sound_offsets[slot + 1]])
+
+    def ipa(self, slot: int) -> str:
+        return str(self.ipas[self.ipa_offsets[slot]:self.ipa_offsets[slot + 1]], 'utf-8')
+
+    def close(self) -> None:
+        for view in [self.sound_offsets, self.sounds, self.ipa_offsets, self.positions,
+                     self.ipas, self.ints, self.view]:
+            view.release()
+        self.map.close()
+
+def write_lexicon(words: list[Word], path: str) -> list[tuple[int, int]]:
+    """
+    Write the words that have an IPA to `path`, for `SharedLexicon`. Return
+    the ranges of slots, `(start, end)`, holding two or more words of the same
+    `word_shape()`.
+    """
+    buckets = {}
+    for (i, word) in enumerate(words):
+        if word.phonology:
+            buckets.setdefault(word_shape(word), []).append(i)
+
+    ids = {}
+    sound_offsets = array('i', [0])
+    sounds = array('i')
+    ipa_offsets = array('i', [0])
+    positions = array('i')
+    ipas = bytearray()
+    ranges = []
+    for bucket in buckets.values():
+        if len(bucket) > 1:
+            ranges.append((len(positions), len(positions) + len(bucket)))
+        for i in bucket:
+            sounds.extend(ids.setdefault(sound, len(ids)) for sound in word_sounds(words[i]))
+            sound_offsets.append(len(sounds))
+            ipas += words[i].ipa.encode('utf-8')
+            ipa_offsets.append(len(ipas))
+            positions.append(i)
+
+    with open(path, "wb") as f:
+        f.write(array('i', [len(positions), len(sounds), len(ipas)]).tobytes())
+        for ints in [sound_offsets, sounds, ipa_offsets, positions]:
+            f.write(ints.tobytes())
+        f.write(ipas)
+    return ranges
+
+def generate_shared(g: MinPairGenerator, words: list[Word], numproc: int,
+                    silent: bool = True) -> list[tuple[int, int, int]]:
+    """
+    Find the same minimal pairs among the words as `g.generate()` would, on
+    `numproc` processes sharing a `SharedLexicon` of them. Return `(i, j,
+    verdict)` for every minimal pair of `words[i]` and `words[j]`, `i < j`, in
+    the order `generate()` finds them in.
+
+    Workers are only sent ranges of slots, and only send back the positions
+    of the words that form minimal pairs. They compare sound ids first, and
+    only parse the IPAs of the pairs of words differing by at most one sound,
+    since no other pair of words of the same shape can be a minimal pair.
+
+    If `g.rejections` isn't None, the workers count why they rejected pairs of
+    words, and the pairs of words of different shapes, which are never
+    compared, are counted here, so that the counts are the same as those of
+    `generate()`.
+    """
+    from multiprocessing import Pool
+    from tqdm import tqdm
+
+    with TemporaryDirectory(prefix="grzegorz-") as tmp:
+        path = join(tmp, "lexicon.bin")
+        tasks = [task for (start, end) in write_lexicon(words, path)
+                 for task in split_rows(start, end)]
+        found = []
+        with Pool(max(1, numproc), initializer=init_shared_worker, initargs=(path, g)) as p:
+            for (pairs, rejections) in tqdm(p.imap_unordered(compare_rows, tasks),
+                                            total=len(tasks), disable=silent, unit=" tasks"):
+                found.extend(pairs)
+                if rejections is not None:
+                    g.rejections.update(rejections)
+    if g.rejections is not None:
+        g.rejections.update(uncompared_rejections(words))
+    found.sort()
+    return found
+
+### HELPER FUNCTIONS ###
+
+def split_rows(start: int, end: int) -> list[tuple[int, int, int, int]]:
+    """
+    Split the comparisons of every slot in `[start, end)` with the slots after
+    it into tasks `(start, end, first row, last row)` of about
+    `TASK_COMPARISONS` comparisons each
+    """
+    tasks = []
+    row = start
+    while row < end - 1:
+        last = row
+        comparisons = 0
+        while last < end - 1 and comparisons < TASK_COMPARISONS:
+            comparisons += end - last - 1
+            last += 1
+        tasks.append((start, end, row, last))
+        row = last
+    return tasks
+
+def uncompared_rejections(words: list[Word]) -> Counter:
+    """
+    Return why `generate()` rejects the pairs of words that aren't of the same
+    `word_shape()`, without comparing them: because either has no IPA, or
+    else because of their syllable count or syllable length
+    """
+    shapes = Counter(word_shape(word) for word in words if word.phonology)
+    syllables = Counter()
+    same_syllables = Counter()
+    for (shape, n) in shapes.items():
+        syllables[len(shape)] += n
+        same_syllables[len(shape)] += n * n
+    with_ipa = sum(shapes.values())
+    without_ipa = len(words) - with_ipa
+
+    rejections = Counter()
+    rejections["no IPA"] = without_ipa * (without_ipa - 1) // 2 + without_ipa * with_ipa
+    rejections["syllable count"] = (with_ipa ** 2 - sum(n * n for n in syllables.values())) // 2
+    rejections["syllable length"] = sum(syllables[c] ** 2 - same_syllables[c]
+                                        for c in syllables) // 2
+    return +rejections
+
+### WORKER PROCESSES ###
+
+_lexicon = None
+_generator = None
+
+def init_shared_worker(path: str, g: MinPairGenerator) -> None:
+    global _lexicon, _generator
+    _lexicon = SharedLexicon(path)
+    _generator = g
+
+def compare_rows(task: tuple[int, int, int, int]) -> tuple[list[tuple[int, int, int]],
+                                                         Counter | None]:
+    """
+    Return the minimal pairs among the rows of the task, and, if the generator
+    counts them, why the other pairs were rejected
+    """
+    (_, end, first, last) = task
+    lexicon = _lexicon
+    rejections = None
+    if _generator.rejections is not None:
+        # counted per task, and added up by the parent
+        rejections = _generator.rejections = Counter()
+    found = []
+    for a in range(first, last):
+        sounds = lexicon.word_sounds(a)
+        word = None
+        for b in range(a + 1, end):
+            # slots of the same shape have as many sounds
+            if sum(map(ne, sounds, lexicon.word_sounds(b))) > 1:
+                if rejections is not None:
+                    rejections["several differences"] += 1
+                continue
+            if word is None:
+                word = Word("", lexicon.ipa(a))
+            (i, j) = (lexicon.positions[a], lexicon.positions[b])
+            other = Word("", lexicon.ipa(b))
+            pair = (word, other) if i < j else (other, word)
+            verdict = _generator.check_minpair(pair)
+            if verdict:
+                found.append((min(i, j), max(i, j), verdict))
+    return (found, rejections)
@@ -0,0 +1,210 @@
+# Copyright (c) 2026 xylous <xylous.e@gmail.com>
+#
+# This file is part of grzegorz.
+# grzegorz is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# grzegorz is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# grzegorz.  If not, see <https://www.gnu.org/licenses/>.
+
+from grzegorz.generator import (MinPairGenerator, MinPairIndex, word_shape)
+from grzegorz.io import (decode_word, encode_minpair)
+from grzegorz.pipeline import chunks
+from grzegorz.word import (Word, parse_phonology)
+
+from heapq import merge
+from itertools import islice
+from os.path import (abspath, dirname, join)
+from tempfile import TemporaryDirectory
+from typing import Iterable, Iterator
+
+"""Roughly how many bytes a parsed and indexed word takes"""
+WORD_COST = 2048
+"""Roughly how many bytes a minimal pair waiting to be spilled takes"""
+PAIR_COST = 256
+"""How many sorted runs are merged at once"""
+MERGE_FAN_IN = 64
+
+def generate_spilled(g: MinPairGenerator, infile: str, outfile: str,
+                     memory_limit: int, silent: bool = True) -> int:
+    """
+    Write the minimal pairs among the words in `infile` to `outfile`, exactly
+    like `generate()` would, but without ever holding much more than
+    `memory_limit` bytes of words and pairs in memory. Return the number of
+    minimal pairs.
+
+    The words are first split by `word_shape()` into temporary files, since
+    only words of the same shape can pair. Every partition is then read in
+    blocks that fit in memory, each compared to the rest of its partition as
+    it's read back from disk. Minimal pairs are sorted and spilled to disk in
+    runs, which are finally merged in the order `generate()` finds them in.
+
+    The cache of `parse_phonology()` is emptied after every pass over a
+    partition, so that it doesn't keep the parses of the words that were
+    streamed past the block, and with them much more than `memory_limit`.
+    """
+    from tqdm import tqdm
+
+    half = max(1, memory_limit // 2)
+    block_size = max(1, half // WORD_COST)
+    run_size = max(1, half // PAIR_COST)
+
+    # spill next to the output rather than into /tmp, which may well be kept
+    # in memory
+    with TemporaryDirectory(prefix=".grzegorz-", dir=dirname(abspath(outfile))) as tmp:
+        partitions = partition_by_shape(infile, tmp, half)
+        parse_phonology.cache_clear()
+        runs = []
+        buffer = []
+        for path in tqdm(partitions, disable=silent, unit=" shapes"):
+            for pair in partition_pairs(g, path, block_size):
+                buffer.append(pair)
+                if len(buffer) >= run_size:
+                    runs.append(spill_run(buffer, join(tmp, f"run-{len(runs)}.txt")))
+                    buffer = []
+        if not runs:
+            buffer.sort()
+            return write_minpairs((line for (_, _, line) in buffer), outfile)
+        if buffer:
+            runs.append(spill_run(buffer, join(tmp, f"run-{len(runs)}.txt")))
+
+        generation = 0
+        while len(runs) > MERGE_FAN_IN:
+            generation += 1
+            merged = []
+            for group in chunks(runs, MERGE_FAN_IN):
+                path = join(tmp, f"run-{generation}-{len(merged)}.txt")
+                merged.append(merge_runs(group, path))
+            runs = merged
+        handles = [open(run, "r", encoding='utf-8') for run in runs]
+        try:
+            lines = merge(*handles, key=run_key)
+            return write_minpairs((line.rstrip("\n").split("\t", 2)[2] for line in lines),
+                                  outfile)
+        finally:
+            for handle in handles:
+                handle.close()
+
+### HELPER FUNCTIONS ###
+
+def partition_by_shape(infile: str, tmp: str, budget: int) -> list[str]:
+    """
+    Split the words in `infile` into one file in `tmp` per `word_shape()`,
+    keeping at most about `budget` bytes of lines in memory before appending
+    them to their files. Every line keeps its position in `infile`. Return the
+    paths of the files with at least two words.
+    """
+    pending = {}
+    sizes = {}
+    buffered = 0
+    with open(infile, "r", encoding='utf-8') as f:
+        for (i, line) in enumerate(f):
+            line = line.rstrip("\n")
+            if not line:
+                continue
+            word = decode_word(line)
+            if not word.phonology:
+                continue
+            shape = word_shape(word)
+            pending.setdefault(shape, []).append(str(i) + "\t" + line + "\n")
+            sizes[shape] = sizes.get(shape, 0) + 1
+            buffered += len(line)
+            if buffered >= budget:
+                flush_partitions(pending, tmp)
+                buffered = 0
+    flush_partitions(pending, tmp)
+    return [partition_path(tmp, shape) for (shape, size) in sizes.items() if size > 1]
+
+def flush_partitions(pending: dict[tuple[int], list[str]], tmp: str) -> None:
+    # append and close every time, rather than keep one file open per shape,
+    # of which there may be more than we're allowed to open
+    for (shape, lines) in pending.items():
+        with open(partition_path(tmp, shape), "a", encoding='utf-8') as f:
+            f.writelines(lines)
+    pending.clear()
+
+def partition_path(tmp: str, shape: tuple[int]) -> str:
+    return join(tmp, "shape-" + "-".join(str(n) for n in shape) + ".txt")
+
+def read_entry(line: str) -> tuple[int, Word]:
+    (position, encoded) = line.rstrip("\n").split("\t", 1)
+    return (int(position), decode_word(encoded))
+
+def partition_pairs(g: MinPairGenerator, path: str,
+                    block_size: int) -> Iterator[tuple[int, int, str]]:
+    """
+    Yield `(i, j, encoded minimal pair)` for all minimal pairs of the words in
+    the partition at `path`, where `i` and `j` are the positions of the words
+    in the input file, `i < j`. Only `block_size` words are kept in memory at
+    once; the rest of the partition is streamed past them.
+    """
+    start = 0
+    while True:
+        with open(path, "r", encoding='utf-8') as f:
+            lines = islice(f, start, None)
+            block = [read_entry(line) for line in islice(lines, block_size)]
+            if not block:
+                return
+            positions = {word: i for (i, word) in block}
+            index = MinPairIndex(g, [word for (_, word) in block])
+            # pairs within the block...
+            for (j, word) in block:
+                for (other, verdict) in index.partners(word):
+                    if positions[other] < j:
+                        if g.stats is not None:
+                            g.stats.add((other, word), verdict)
+                        yield (positions[other], j, encode_minpair((other, word)))
+            # ...and between the block and the words after it
+            for line in lines:
+                (j, word) = read_entry(line)
+                for (other, verdict) in index.partners(word):
+                    if g.stats is not None:
+                        g.stats.add((other, word), verdict)
+                    yield (positions[other], j, encode_minpair((other, word)))
+        # the words of the block are kept by the index, but those streamed
+        # past it would only be kept by the cache
+        parse_phonology.cache_clear()
+        start += block_size
+
+def spill_run(buffer: list[tuple[int, int, str]], path: str) -> str:
+    """Sort the pairs and write them to `path`; return `path`"""
+    buffer.sort()
+    with open(path, "w", encoding='utf-8') as f:
+        for (i, j, line) in buffer:
+            f.write(str(i) + "\t" + str(j) + "\t" + line + "\n")
+    return path
+
+def run_key(line: str) -> tuple[int, int]:
+    (i, j, _) = line.split("\t", 2)
+    return (int(i), int(j))
+
+def merge_runs(runs: list[str], path: str) -> str:
+    """Merge the sorted runs into one at `path`; return `path`"""
+    handles = [open(run, "r", encoding='utf-8') for run in runs]
+    try:
+        with open(path, "w", encoding='utf-8') as f:
+            f.writelines(merge(*handles, key=run_key))
+    finally:
+        for handle in handles:
+            handle.close()
+    return path
+
+def write_minpairs(lines: Iterable[str], outfile: str) -> int:
+    """
+    Write the encoded minimal pairs to `outfile`, in the same format as
+    `encode_format()`, and return how many there were
+    """
+    n = 0
+    with open(outfile, "w", encoding='utf-8') as f:
+        for line in lines:
+            if n:
+                f.write("\n")
+            f.write(line)
+            n += 1
+    return n
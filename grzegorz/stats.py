@@ -0,0 +1,111 @@
+# Copyright (c) 2026 xylous <xylous.e@gmail.com>
+#
+# This file is part of grzegorz.
+# grzegorz is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# grzegorz is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# grzegorz.  If not, see <https://www.gnu.org/licenses/>.
+
+from grzegorz.generator import contrast_differences
+from grzegorz.word import (WordPair, PHONEME_MINPAIR, STRESS_MINPAIR, INDEL_MINPAIR,
+                           VERDICT_NAMES, stress_name)
+
+from collections import Counter
+
+class ContrastStats:
+    """
+    How many minimal pairs there are of every kind of contrast, of every two
+    contrasted sounds, and with the difference in every position of the word,
+    counted as the minimal pairs are found
+    """
+    def __init__(self) -> None:
+        self.minpairs = 0
+        self.contrasts = Counter()
+        self.sounds = Counter()
+        self.positions = Counter()
+
+    def add(self, pair: WordPair, verdict: int) -> None:
+        self.minpairs += 1
+        self.contrasts[VERDICT_NAMES[verdict]] += 1
+        for diff in contrast_differences(pair, verdict):
+            self.sounds[sounds_name(diff, verdict)] += 1
+        # a sound more may well be a syllable more
+        length = max(len(pair[0].phonology), len(pair[1].phonology))
+        for i in differing_syllables(pair, verdict):
+            self.positions[position_name(i, length)] += 1
+
+    def as_dict(self) -> dict:
+        return {
+            "minimal_pairs": self.minpairs,
+            "contrasts": dict(self.contrasts.most_common()),
+            "sounds": dict(self.sounds.most_common()),
+            "positions": dict(self.positions.most_common()),
+        }
+
+    def write(self, path: str) -> None:
+        """Write the statistics to `path`, as CSV if it ends in `.csv`, or else as JSON"""
+        if path.endswith(".csv"):
+            import csv
+            with open(path, "w", encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(["histogram", "key", "count"])
+                for (histogram, counts) in [("contrast", self.contrasts),
+                                            ("sounds", self.sounds),
+                                            ("position", self.positions)]:
+                    for (key, n) in counts.most_common():
+                        writer.writerow([histogram, key, n])
+        else:
+            import json
+            with open(path, "w", encoding='utf-8') as f:
+                json.dump(self.as_dict(), f, indent=4, ensure_ascii=False)
+                f.write("\n")
+
+### HELPER FUNCTIONS ###
+
+def sounds_name(diff: tuple[str, str], verdict: int) -> str:
+    """
+    Return the name of the contrasted sounds, the same whichever word comes
+    first, e.g. "ɕ/ʂ"; a missing sound is written as "∅", and stress by its type
+    """
+    if verdict == STRESS_MINPAIR:
+        diff = (stress_name(diff[0]), stress_name(diff[1]))
+    return "/".join(sorted(sound or "∅" for sound in diff))
+
+def differing_syllables(pair: WordPair, verdict: int) -> list[int]:
+    """Return the indices of the syllables in which the two words differ"""
+    if verdict == STRESS_MINPAIR:
+        return [i for (i, (syl1, syl2)) in enumerate(zip(pair[0].phonology, pair[1].phonology))
+                if syl1.stress != syl2.stress]
+    if verdict == INDEL_MINPAIR:
+        # the syllable of the longer word with the sound the other doesn't have
+        phones = [[(i, phone.sound) for (i, syllable) in enumerate(word.phonology)
+                   for phone in syllable.contents]
+                  for word in pair]
+        (longer, shorter) = sorted(phones, key=len, reverse=True)
+        j = 0
+        while j < len(shorter) and longer[j][1] == shorter[j][1]:
+            j += 1
+        return [longer[j][0]]
+    if verdict == PHONEME_MINPAIR:
+        # not the syllables where a sound is only longer
+        return [i for (i, (syl1, syl2)) in enumerate(zip(pair[0].phonology, pair[1].phonology))
+                if [phone.sound for phone in syl1.contents]
+                   != [phone.sound for phone in syl2.contents]]
+    return [i for (i, (syl1, syl2)) in enumerate(zip(pair[0].phonology, pair[1].phonology))
+            if syl1.contents != syl2.contents]
+
+def position_name(i: int, length: int) -> str:
+    if length == 1:
+        return "monosyllable"
+    elif i == 0:
+        return "initial"
+    elif i == length - 1:
+        return "final"
+    return "medial"
@@ -13,81 +13,298 @@
 # You should have received a copy of the GNU General Public License along with
 # grzegorz.  If not, see <https://www.gnu.org/licenses/>.
 
-from grzegorz.fetcher import get_ipa_for_word
+from grzegorz.cache import DEFAULT_LOOKUP_TTL_DAYS
 from grzegorz.generator import (MinPairGenerator)
-from grzegorz.anki_integration import (minpairs_to_deck, export_deck)
-from grzegorz.wordlist import (wordlist, print_languages_list, valid_lang)
-from grzegorz.word import Word
+from grzegorz.word import (Word, WordPair, VERDICT_NAMES)
+from grzegorz.pipeline import map_chunked
+from grzegorz.instrument import (Report, stage, stage_prefix, count, record_latency,
+                                 current_report, start_report)
 from grzegorz.io import *
 
-from os import (remove, linesep)
-from multiprocessing import Pool
-from threading import Lock
-from functools import partial
-from tqdm import tqdm
+from os import (remove, replace, linesep, cpu_count)
+from os.path import exists
+from typing import Iterator
 
-def fullmake(language: str, bounds: str, clean: bool) -> None:
+# Commands that need network, multiprocessing or Anki libraries import them
+# themselves, so that running light commands such as `analyse` or `check`
+# doesn't take most of its time importing libraries it never uses.
+
+def fullmake(language: str, bounds: str, clean: bool, pipeline: bool = False) -> None:
     """
     Practically: wrap all commands into one. If `clean` is True, then
     temporary files created by this function are removed.
+
+    If `pipeline` is True, all steps run at the same time instead of one after
+    the other: words go on to the generator as soon as their IPA is fetched,
+    and minimal pairs go on to the deck as soon as they're found. In that case,
+    if `clean` is True, temporary files aren't even created.
     """
 
-    wordlist_file = language + "-wordlist.txt"
-    ipa_file = language + "-ipa.txt"
-    minpairs_file = language + "-minpairs.txt"
-    makedeck_file = "grzegorz-" + language + "-minpairs.apkg"
+    (wordlist_file, ipa_file, minpairs_file, makedeck_file) = fullmake_files(language)
 
-    if wordlist_command(language, bounds, wordlist_file) == 1:
-        exit(1)
+    if pipeline:
+        pipelined_fullmake(language, bounds, makedeck_file,
+                           None if clean else wordlist_file,
+                           None if clean else ipa_file,
+                           None if clean else minpairs_file)
+        return
+
+    with stage("wordlist"):
+        if wordlist_command(language, bounds, wordlist_file) == 1:
+            exit(1)
     fetchipa(wordlist_file, ipa_file, False, 20)
     generate_command(ipa_file, minpairs_file, False, False, False, False)
     makedeck(minpairs_file, makedeck_file)
 
     if clean:
-        print("Removing temporary files...")
-        remove(wordlist_file)
-        remove(ipa_file)
-        remove(minpairs_file)
+        remove_fullmake_files(language)
+
+def multi_fullmake(languages: list[str], bounds: str, clean: bool,
+                   numproc: int = cpu_count() or 1) -> None:
+    """
+    Build the decks of several languages, with the same files as `fullmake()`
+    would build them one after the other, but scheduled together. The IPAs of
+    one language after the other are fetched on a single pool of processes,
+    under a single limit on concurrent requests, since it's Wiktionary that
+    limits how fast they come, whichever language they're in. Meanwhile, the
+    minimal pairs and decks of the languages already fetched are built on
+    another pool of `numproc` processes.
+
+    The stages of every language are measured under the language's name, e.g.
+    `polish-fetchipa`, and those measured on the builders are added to the
+    report of this process.
+    """
+    from grzegorz.scheduler import AIMDController
+    from grzegorz.wordlist import valid_lang
+    from multiprocessing import Pool
+
+    for language in languages:
+        if not valid_lang(language):
+            print(language, "Error: that is not a language for which a wordlist can be fetched", sep='')
+            exit(1)
+
+    report = current_report()
+    measure = (report is not None, report.profile_dir if report is not None else None)
+    failed = []
+    builds = []
+    # the builders are started first, so that they don't inherit the fetchers'
+    # threads
+    with Pool(max(1, numproc)) as builders, Pool(20) as fetchers:
+        controller = AIMDController(20)
+        for language in languages:
+            (wordlist_file, ipa_file, _, _) = fullmake_files(language)
+            with stage_prefix(language + "-"):
+                with stage("wordlist"):
+                    if wordlist_command(language, bounds, wordlist_file) == 1:
+                        failed.append(language)
+                        continue
+                fetchipa(wordlist_file, ipa_file, False, 20, pool=fetchers,
+                         controller=controller)
+            builds.append((language, builders.apply_async(build_language_deck,
+                                                          (language, clean, *measure))))
+        print("Waiting for the decks to be built...")
+        for (language, build) in builds:
+            (status, measured) = build.get()
+            if measured is not None:
+                report.merge(measured)
+            if status != 0:
+                failed.append(language)
+
+    if failed:
+        print("Error: could not build the decks of", ", ".join(failed))
+        exit(1)
+    print("Done! Now import",
+          ", ".join(fullmake_files(language)[3] for language in languages), "in your Anki")
+
+def fullmake_files(language: str) -> tuple[str, str, str, str]:
+    """Return the wordlist, IPA, minimal pairs and deck files `fullmake()` builds"""
+    return (language + "-wordlist.txt",
+            language + "-ipa.txt",
+            language + "-minpairs.txt",
+            "grzegorz-" + language + "-minpairs.apkg")
+
+def remove_fullmake_files(language: str) -> None:
+    (wordlist_file, ipa_file, minpairs_file, _) = fullmake_files(language)
+    print("Removing temporary files...")
+    remove(wordlist_file)
+    remove(ipa_file)
+    remove(checkpoint_path(ipa_file))
+    remove(minpairs_file)
+
+def build_language_deck(language: str, clean: bool, measure: bool = False,
+                        profile_dir: str | None = None) -> tuple[int, Report | None]:
+    """
+    Generate the minimal pairs and the deck of a language whose IPAs are
+    fetched, in a worker process of `multi_fullmake()`. Return 1 on failure,
+    and 0 otherwise, along with what was measured, if `measure` is True.
+    """
+    (_, ipa_file, minpairs_file, makedeck_file) = fullmake_files(language)
+    # a report of this language only, since the worker builds several
+    report = start_report(profile_dir) if measure else None
+    status = 0
+    try:
+        with stage_prefix(language + "-"):
+            generate_command(ipa_file, minpairs_file, False, False, False, False)
+            makedeck(minpairs_file, makedeck_file)
+        if clean:
+            remove_fullmake_files(language)
+    except SystemExit as err:
+        # commands exit on errors, which would take the worker down with them
+        status = 1 if err.code else 0
+    except Exception as err:
+        # nor should a language take down the others
+        print("Error: could not build the deck of", language + ":", repr(err))
+        status = 1
+    return (status, report)
+
+def pipelined_fullmake(language: str, bounds: str, makedeck_file: str,
+                       wordlist_file: str | None, ipa_file: str | None,
+                       minpairs_file: str | None) -> None:
+    """
+    Build the Anki deck with fetching, generating and deck building all
+    running at the same time. The intermediate files are only written if their
+    paths aren't None.
+    """
+    from grzegorz.anki_integration import export_minpairs
+    from grzegorz.pipeline import run_pipeline
+    from grzegorz.wordlist import (wordlist, valid_lang)
+
+    parsed_bounds = parse_bounds(bounds)
+    if parsed_bounds is None:
+        exit(1)
+    if not valid_lang(language):
+        print(language, "Error: that is not a language for which a wordlist can be fetched", sep='')
+        exit(1)
+    (lowerbound, upperbound) = parsed_bounds
+    raw_words = wordlist(language, upperbound, lowerbound)
+    if not raw_words:
+        exit(1)
+    language = raw_words.pop(0)
+    if wordlist_file is not None:
+        writefile(wordlist_file, '\n'.join([language] + raw_words))
+
+    def fetched_words() -> Iterator[Word]:
+        # words fetched by an earlier, interrupted run aren't fetched again,
+        # but they're still needed for generating minimal pairs
+        if ipa_file is not None and exists(ipa_file):
+            repair_partial_line(ipa_file)
+            yield from decode_format(decode_word, readfile(ipa_file))
+        yield from fetch_ipas(raw_words, language, ipa_file, False)
+
+    def generate(words: Iterator[Word]) -> Iterator[WordPair]:
+        g = MinPairGenerator(True, True, True, True)
+        if current_report() is not None:
+            g.rejections = current_report().rejections
+        handle = open(minpairs_file, "w", encoding='utf-8') if minpairs_file else None
+        try:
+            for word in words:
+                count("words generated from")
+                for pair in g.feed(word):
+                    if handle is not None:
+                        handle.write(encode_minpair(pair) + "\n")
+                    yield pair
+        finally:
+            if handle is not None:
+                handle.close()
+
+    def build_deck(minpairs: Iterator[WordPair]) -> int:
+        return export_minpairs(minpairs, makedeck_file)
+
+    with stage("pipeline") as measured:
+        numpairs = run_pipeline(fetched_words(), [generate], build_deck)
+        measured.items = numpairs
+    count("minimal pairs", numpairs)
+    print('Done! Found', numpairs, 'minimal pairs; now import', makedeck_file, 'in your Anki')
 
 def list_languages() -> None:
+    from grzegorz.wordlist import print_languages_list
     print_languages_list()
 
 def print_analysis(ipa: str) -> None:
     Word("", ipa).print_human_readable()
 
-def print_minpair_check(ipa1: str, ipa2: str) -> None:
+def analyse_batch(infile: str, numproc: int = cpu_count() or 1) -> None:
+    """
+    Phonologically parse every IPA in `infile` (or stdin, if it's "-"), one per
+    line, and print the parses as JSON Lines, one line per IPA. Lines may also
+    be words in the format of `fetchipa`, e.g. `bard, /bɑːd/`.
+    """
+    import sys
+    handle = sys.stdin if infile == "-" else open(infile, "r", encoding='utf-8')
+    try:
+        lines = (line.rstrip("\n") for line in handle)
+        for parses in map_chunked(analyse_lines, lines, numproc):
+            sys.stdout.write(parses)
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+def analyse_lines(lines: list[str]) -> str:
+    """Return the output of `analyse_batch()` for the given lines"""
+    import json
+    out = []
+    for line in lines:
+        if GRZEGORZ_WORD_FORMAT_SEPARATOR in line:
+            word = decode_word(line)
+        else:
+            word = Word("", line)
+        out.append(json.dumps(word.as_dict(), ensure_ascii=False) + "\n")
+    return "".join(out)
+
+def print_minpair_check(ipa1: str, ipa2: str, keep_indels: bool = False) -> None:
     word1 = Word("", ipa2)
     word2 = Word("", ipa1)
-    generator = MinPairGenerator(False, True, True, True)
+    generator = MinPairGenerator(False, True, True, True, keep_indels)
     if not generator.print_human_readable_check(word1, word2):
         exit(1)
 
-def wordlist_command(language: str, bounds: str, outfile: str) -> int:
+def check_batch(infile: str, numproc: int = cpu_count() or 1,
+                keep_indels: bool = False) -> None:
+    """
+    Check every pair of tab-separated IPAs in `infile` (or stdin, if it's "-"),
+    one pair per line, and print one line per pair: the verdict (phoneme,
+    chroneme, stress or none, and indel if `keep_indels` is True), a tab, and
+    the differences that make it a minimal pair, e.g. `phoneme	n/ŋ`. Lines
+    that aren't a pair of IPAs get the `invalid` verdict.
+    """
+    import sys
+    from functools import partial
+    handle = sys.stdin if infile == "-" else open(infile, "r", encoding='utf-8')
+    try:
+        lines = (line.rstrip("\n") for line in handle)
+        hook = partial(check_lines, keep_indels=keep_indels)
+        for verdicts in map_chunked(hook, lines, numproc):
+            sys.stdout.write(verdicts)
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+def wordlist_command(language: str, bounds: str, outfile: str, cache: bool = True,
+                     corpus: list[str] | None = None,
+                     numproc: int = cpu_count() or 1) -> int:
     """
     Fetch a word list of `numwords` and put it into `outfile` for the given
     language, if it's valid
     If the operation failed, then return 1, otherwise return 0
+
+    If `corpus` isn't None, the words are instead counted in the given text
+    files, on `numproc` processes, and any language is accepted.
     """
-    spl = bounds.split(":")
-    if bounds.isnumeric():
-        lowerbound = 0
-        upperbound = int(bounds)
-    elif spl[0].isnumeric() and spl[1].isnumeric():
-        lowerbound = int(spl[0])
-        upperbound = int(spl[1])
-    else:
-        print("Error: can't recognise bounds. Only positive integers are allowed before and after the ':'")
-        return 1
+    from grzegorz.wordlist import (wordlist, valid_lang)
 
-    if lowerbound > upperbound:
-        print("Error: lower bound is bigger than upper bound; abort")
+    parsed_bounds = parse_bounds(bounds)
+    if parsed_bounds is None:
         return 1
+    (lowerbound, upperbound) = parsed_bounds
+
+    if corpus is not None:
+        return corpus_wordlist(language, lowerbound, upperbound, outfile, corpus, numproc)
 
     if not valid_lang(language):
         print(language, "Error: that is not a language for which a wordlist can be fetched", sep='')
         return 1
 
-    raw_words = wordlist(language, upperbound, lowerbound)
+    raw_words = wordlist(language, upperbound, lowerbound, cache)
     if raw_words:
         writefile(outfile, '\n'.join(raw_words))
         print("Fetched", upperbound - lowerbound, language, "words into", outfile)
@@ -95,48 +312,287 @@ def wordlist_command(language: str, bounds: str, outfile: str) -> int:
     else:
         return 1
 
-def fetchipa(infile: str, outfile: str, keep_failed: bool, numproc: int = 20) -> None:
+def corpus_wordlist(language: str, lowerbound: int, upperbound: int, outfile: str,
+                    corpus: list[str], numproc: int) -> int:
+    """Write the wordlist counted in the `corpus` files to `outfile`"""
+    from grzegorz.corpus import (corpus_frequencies, most_frequent)
+    from grzegorz.wordlist import (valid_lang, lang_name)
+
+    for path in corpus:
+        if not exists(path):
+            print("Error: no such file:", path)
+            return 1
+    print("Counting words in", len(corpus), "files...")
+    with stage("wordlist") as measured:
+        frequencies = corpus_frequencies(corpus, numproc)
+        measured.items = len(frequencies)
+    words = most_frequent(frequencies, upperbound, lowerbound)
+    if not words:
+        print("Error: no words found in", ", ".join(corpus))
+        return 1
+    # `fetchipa` takes the language from the first line
+    header = lang_name(language) if valid_lang(language) else language
+    writefile(outfile, '\n'.join([header] + words))
+    print("Counted", sum(frequencies.values()), "words,", len(frequencies), "of them different;",
+          "kept", len(words), language, "words in", outfile)
+    return 0
+
+batch_generator = None
+"""The generator that `check_lines()` uses, created once per process"""
+
+def check_lines(lines: list[str], keep_indels: bool = False) -> str:
+    """Return the output of `check_batch()` for the given lines"""
+    global batch_generator
+    if batch_generator is None or batch_generator.keep_indels != keep_indels:
+        batch_generator = MinPairGenerator(False, True, True, True, keep_indels)
+
+    out = []
+    for line in lines:
+        ipas = line.split("\t")
+        if len(ipas) != 2:
+            out.append("invalid\t\n")
+            continue
+        (verdict, diffs) = batch_generator.contrast((Word("", ipas[0]), Word("", ipas[1])))
+        out.append(VERDICT_NAMES[verdict] + "\t"
+                   + " ".join(a + "/" + b for (a, b) in diffs) + "\n")
+    return "".join(out)
+
+def parse_bounds(bounds: str) -> tuple[int, int] | None:
     """
-    Given an input file containing a list of words separated, fetch the IPAs and
-    create a text file with their IPA spellings matched to their text
+    Turn the bounds of a wordlist, e.g. "5000" or "1500:3000", into a tuple of
+    the lower and upper bound. If they're not valid, print why and return None.
     """
+    spl = bounds.split(":")
+    if bounds.isnumeric():
+        lowerbound = 0
+        upperbound = int(bounds)
+    elif len(spl) == 2 and spl[0].isnumeric() and spl[1].isnumeric():
+        lowerbound = int(spl[0])
+        upperbound = int(spl[1])
+    else:
+        print("Error: can't recognise bounds. Only positive integers are allowed before and after the ':'")
+        return None
 
-    # Ensure that we're processing the data with at least one thread
-    if numproc < 1:
-        numproc = 1
+    if lowerbound > upperbound:
+        print("Error: lower bound is bigger than upper bound; abort")
+        return None
+    return (lowerbound, upperbound)
 
+def fetchipa(infile: str, outfile: str, keep_failed: bool, numproc: int = 20,
+             retries: int = 5, cache_ttl_days: float = DEFAULT_LOOKUP_TTL_DAYS,
+             pool=None, controller=None, flush_every: int = DEFAULT_FLUSH_EVERY,
+             flush_interval: float = DEFAULT_FLUSH_INTERVAL) -> None:
+    """
+    Given an input file containing a list of words separated, fetch the IPAs and
+    create a text file with their IPA spellings matched to their text. Words
+    that a previous run has already fetched into `outfile` are skipped.
+    """
     wordlist = readfile(infile).splitlines()
 
     language = wordlist.pop(0)
     words = [line for line in wordlist if line]
-    numwords = len(words)
 
     print("NOTE:",
             "  Words are appended progressively to the file, so progress won't be lost.",
             "  However, you won't be able to read the file while the program is running.",
             sep=linesep)
 
-    print("Fetching IPA spellings for", numwords, language, "words...")
-    with open(outfile, "a", encoding='utf-8') as handle:
-        with Pool(numproc) as p:
-            for fetched_word in tqdm(p.imap_unordered(partial(get_ipa_for_word, language=language),
-                words), total=numwords):
-                if keep_failed or fetched_word.ipa != "":
-                    encoded = encode_word(fetched_word) + "\n"
-                    with Lock():
-                        handle.write(encoded)
+    with stage("fetchipa") as measured:
+        for _ in fetch_ipas(words, language, outfile, keep_failed, numproc, retries,
+                            cache_ttl_days, pool, controller, flush_every,
+                            flush_interval):
+            measured.items += 1
+
+def fetch_ipas(words: list[str], language: str, outfile: str | None,
+               keep_failed: bool, numproc: int = 20, retries: int = 5,
+               cache_ttl_days: float = DEFAULT_LOOKUP_TTL_DAYS,
+               pool=None, controller=None, flush_every: int = DEFAULT_FLUSH_EVERY,
+               flush_interval: float = DEFAULT_FLUSH_INTERVAL) -> Iterator[Word]:
+    """
+    Fetch the IPAs of the words, append them to `outfile` (unless it's None)
+    and yield them as they come, including those whose IPA wasn't found. Words
+    that a previous run has already fetched into `outfile` are skipped.
+
+    At most `numproc` requests are made at once; fewer, if Wiktionary can't
+    keep up. Words that still can't be fetched after `retries` retries are
+    left out of the checkpoint, so that the next run tries them again.
+
+    Words that had no pronunciation the last time they were looked up, less
+    than `cache_ttl_days` days ago, aren't looked up again; words that were
+    found under a different spelling are looked up under that spelling only.
+
+    The words are assumed to be in order of frequency, and every word written
+    to `outfile` keeps its rank.
+
+    If `pool` and `controller` aren't None, the words are fetched on that
+    process pool, under that `AIMDController`, instead of on a pool of their
+    own, so that several lists of words can share them.
+
+    Words are written to `outfile` in batches, by a `CheckpointedWriter`, at
+    least every `flush_every` words or `flush_interval` seconds.
+    """
+    from grzegorz.cache import LookupCache
+    from grzegorz.scheduler import (FetchScheduler, AIMDController)
+    from contextlib import nullcontext
+    from multiprocessing import Pool
+    from tqdm import tqdm
+
+    # Ensure that we're processing the data with at least one thread
+    if numproc < 1:
+        numproc = 1
+
+    ranks = {}
+    for (i, word) in enumerate(words):
+        ranks.setdefault(word, i + 1)
+    numwords = len(words)
+    writer = None
+    if outfile is not None:
+        # opened first, so that lines left half-written by a crash are gone
+        writer = CheckpointedWriter(outfile, flush_every, flush_interval)
+        fetched = read_fetched_words(outfile)
+        words = [word for word in words if word not in fetched]
+        if numwords - len(words):
+            print("Resuming: skipping", numwords - len(words), "words already fetched into", outfile)
+
+    def save(query: str, fetched_word: Word) -> None:
+        if writer is None:
+            return
+        entry = None
+        if keep_failed or fetched_word.ipa != "":
+            entry = encode_word(Word(fetched_word.text, fetched_word.ipa, ranks.get(query)))
+        writer.write(query, entry)
+
+    try:
+        with LookupCache(language, cache_ttl_days * 24 * 60 * 60) as cache:
+            # several words in the wordlist may be looked up under the same spelling
+            lookups = {}
+            skipped = 0
+            for word in words:
+                if cache.is_missing(word):
+                    skipped += 1
+                    save(word, Word(word, "", ranks[word]))
+                    yield Word(word, "", ranks[word])
+                else:
+                    lookups.setdefault(cache.variant(word), []).append(word)
+            if skipped > 0:
+                print("Skipping", skipped, "words recently found to have no IPA")
+
+            print("Fetching IPA spellings for", len(lookups), language, "words...")
+            tasks = [(lookup, language, lookup == queries[0])
+                     for (lookup, queries) in lookups.items()]
+            if controller is None:
+                controller = AIMDController(numproc)
+            with (Pool(numproc) if pool is None else nullcontext(pool)) as p:
+                scheduler = FetchScheduler(p, controller, retries)
+                for result in tqdm(scheduler.run(tasks), total=len(tasks)):
+                    record_latency(result.latency)
+                    if result.error is not None:
+                        tqdm.write("Error: " + result.error)
+                        continue
+                    fetched_word = result.word
+                    fetched_word.rank = ranks[lookups[result.query][0]]
+                    for query in lookups[result.query]:
+                        cache.record(query, fetched_word.text if fetched_word.ipa != "" else "")
+                        save(query, fetched_word)
+                    yield fetched_word
+    finally:
+        if writer is not None:
+            writer.close()
+
+    stats = scheduler.stats
+    print("Fetching done:", stats.summary())
+    count("fetch requests", stats.requests)
+    count("fetch retries", stats.retries)
+    count("fetch throttled", stats.throttled)
+    count("fetch failures", len(stats.failures))
+    if stats.failures:
+        print("Could not fetch", len(stats.failures), "words;",
+              "re-run the same command to try them again")
+
+def ingestipa(dump: str, infile: str, outfile: str, keep_failed: bool,
+              numproc: int = cpu_count() or 1) -> None:
+    """
+    Like `fetchipa`, but take the IPAs from a locally stored Wiktionary dump
+    instead of fetching them one page at a time
+    """
+    from grzegorz.fetcher import (wiktionary_language, CASE_VARIANT_LANGUAGES)
+    from grzegorz.ingest import ingest_dump
+    from tqdm import tqdm
+
+    if numproc < 1:
+        numproc = 1
+
+    wordlist = readfile(infile).splitlines()
+    language = wordlist.pop(0)
+    words = [line for line in wordlist if line]
+    wanted = set(words)
+    # in German, nouns are capitalized, but the wordlist might not respect that
+    capitalize = wiktionary_language(language) in CASE_VARIANT_LANGUAGES
+    if capitalize:
+        wanted |= {word.capitalize() for word in words}
+
+    print("Reading IPA spellings for", len(words), language, "words from", dump, "...")
+    found = {}
+    for (title, ipa) in tqdm(ingest_dump(dump, language, wanted, numproc), unit=" entries"):
+        # several entries may share a title; keep the first one, like `fetchipa`
+        found.setdefault(title, ipa)
+
+    fetched_words = []
+    for (rank, word) in enumerate(words, 1):
+        if capitalize and word not in found and word.capitalize() in found:
+            word = word.capitalize()
+        fetched_words.append(Word(word, found.get(word, ""), rank))
+    numfound = len([word for word in fetched_words if word.ipa != ""])
+    if not keep_failed:
+        fetched_words = [word for word in fetched_words if word.ipa != ""]
+    # no trailing newline if there are no words, which would be an empty word
+    writefile(outfile, "".join(encode_word(word) + "\n" for word in fetched_words))
+    print("Done! Found the IPA of", numfound, "out of", len(words), "words")
 
 def generate_command(infile, outfile, nooptimise, no_phonemes, no_chronemes,
-                     no_stress, filter_file_path=None) -> None:
-    words = decode_format(decode_word, readfile(infile))
+                     no_stress, filter_file_path=None, memory_limit=None,
+                     sample_size=None, time_budget=None, keep_indels=False,
+                     top=None, contrast_quota=None, pair_quota=None,
+                     stats_path=None, numproc=1, feature_distance=None) -> None:
+    """
+    Find the minimal pairs among the words in `infile` and write them to
+    `outfile`. If `memory_limit` (in megabytes) isn't None, words and pairs are
+    spilled to disk so as to stay within it, instead of being kept in memory.
+
+    If `sample_size` or `time_budget` (in seconds) isn't None, only randomly
+    chosen pairs of words are compared: a sample of the minimal pairs found is
+    written to `outfile`, and the number of minimal pairs a full run would
+    find is estimated.
+
+    If `keep_indels` is True, pairs of words where one has a sound more than
+    the other are kept as well.
+
+    If `top` isn't None, only the `top` minimal pairs of the most frequent
+    words are kept, with at most `contrast_quota` of every kind of contrast
+    and `pair_quota` of every two contrasted sounds.
+
+    If `stats_path` isn't None, how many minimal pairs there are of every
+    contrast, every two contrasted sounds and every syllable position is
+    counted while generating them, and written to `stats_path`.
+
+    If `numproc` is more than 1, words are compared on that many processes,
+    which share the words through a `SharedLexicon`.
+
+    If `feature_distance` isn't None, phoneme contrasts are kept if the two
+    sounds differ in at most that many distinctive features, instead of by the
+    filter pairs.
+    """
     g = MinPairGenerator(
         not nooptimise,
         not no_phonemes,
         not no_chronemes,
-        not no_stress
+        not no_stress,
+        keep_indels
     )
     if filter_file_path is not None:
         g.set_filter_pairs_from_file(filter_file_path)
+    if feature_distance is not None:
+        g.set_feature_distance(feature_distance)
 
     if no_phonemes and not no_chronemes and not no_stress:
         print("Generator: skipping all contrasts means no minimal pairs will be generated; abort")
@@ -147,15 +603,304 @@ def generate_command(infile, outfile, nooptimise, no_phonemes, no_chronemes,
         print("Generator: chroneme contrasts will be ignored")
     if no_stress:
         print("Generator: syllable stress contrasts will be ignored")
+    if current_report() is not None:
+        g.rejections = current_report().rejections
+    if stats_path is not None:
+        from grzegorz.stats import ContrastStats
+        g.stats = ContrastStats()
+
+    if memory_limit is not None:
+        from grzegorz.spill import generate_spilled
+        print('Generating minimal pairs from', infile, 'within', memory_limit, 'MB of memory')
+        with stage("generate") as measured:
+            numpairs = generate_spilled(g, infile, outfile, memory_limit * 1024 * 1024, False)
+            measured.items = numpairs
+        count("minimal pairs", numpairs)
+        write_stats(g, stats_path)
+        print('Done! Generated', numpairs, 'minimal pairs')
+        return
+
+    with stage("read") as measured:
+        words = decode_format(decode_word, readfile(infile))
+        measured.items = len(words)
+
+    if sample_size is not None or time_budget is not None:
+        sample_command(g, words, outfile, sample_size, time_budget)
+        write_stats(g, stats_path)
+        return
+
+    if top is not None:
+        from grzegorz.ranking import top_minpairs
+        print('Generating the', top, 'most frequent minimal pairs from:', len(words), 'words')
+        with stage("generate") as measured:
+            minpairs = top_minpairs(g, words, top, contrast_quota, pair_quota)
+            measured.items = len(minpairs)
+        count("minimal pairs", len(minpairs))
+        with stage("write") as measured:
+            writefile(outfile, encode_format(encode_minpair, minpairs))
+            measured.items = len(minpairs)
+        write_stats(g, stats_path)
+        print('Done! Generated', len(minpairs), 'minimal pairs')
+        return
 
     print('Generating minimal pairs from:', len(words), 'words')
-    minpairs = g.generate(words, False)
-    writefile(outfile, encode_format(encode_minpair, minpairs))
+    with stage("generate") as measured:
+        if numproc > 1:
+            from grzegorz.shared import generate_shared
+            minpairs = []
+            for (i, j, verdict) in generate_shared(g, words, numproc, False):
+                minpairs.append((words[i], words[j]))
+                if g.stats is not None:
+                    g.stats.add(minpairs[-1], verdict)
+        elif keep_indels:
+            # words of different shapes are compared too, so don't compare
+            # them all to each other
+            minpairs = g.generate_indexed(words, False)
+        else:
+            minpairs = g.generate(words, False)
+        measured.items = len(words) * (len(words) - 1) // 2
+    count("minimal pairs", len(minpairs))
+    with stage("write") as measured:
+        writefile(outfile, encode_format(encode_minpair, minpairs))
+        measured.items = len(minpairs)
+    write_stats(g, stats_path)
     print('Done! Generated', len(minpairs), 'minimal pairs')
 
-def makedeck(infile: str, outfile: str) -> None:
-    """Create an Anki deck given a file full of minimal pairs"""
-    minpairs = decode_format(decode_minpair, readfile(infile))
-    deck = minpairs_to_deck(minpairs)
-    export_deck(deck, outfile)
-    print('Done! Now import', outfile, 'in your Anki')
+def write_stats(g: MinPairGenerator, stats_path: str | None) -> None:
+    if stats_path is not None:
+        g.stats.write(stats_path)
+        print("Statistics of the minimal pairs written to", stats_path)
+
+def sample_command(g: MinPairGenerator, words: list[Word], outfile: str,
+                   sample_size: int | None, time_budget: float | None) -> None:
+    """
+    Compare random pairs of words for a while, write a sample of the minimal
+    pairs found to `outfile`, and print how many a full run would find
+    """
+    from grzegorz.sampling import (sample_minpairs, DEFAULT_SAMPLE_SIZE, DEFAULT_TIME_BUDGET)
+
+    if sample_size is None:
+        sample_size = DEFAULT_SAMPLE_SIZE
+    if time_budget is None:
+        time_budget = DEFAULT_TIME_BUDGET
+    print('Sampling minimal pairs from:', len(words), 'words, for at most', time_budget, 'seconds')
+    with stage("sample") as measured:
+        sample = sample_minpairs(g, words, sample_size, time_budget)
+        measured.items = sample.comparisons
+    writefile(outfile, encode_format(encode_minpair, sample.reservoir))
+    if g.stats is not None:
+        # only of the minimal pairs written, which are few
+        for pair in sample.reservoir:
+            g.stats.add(pair, g.check_minpair(pair))
+
+    print("Made", sample.comparisons, "random draws, with replacement, from the", sample.space,
+          "pairs of words with the same syllable structure in", f"{sample.seconds:.1f}s")
+    total = 0
+    for verdict in sorted(g.kept_contrasts()):
+        (estimate, low, high) = sample.estimate(verdict)
+        total += estimate
+        print(f"  {VERDICT_NAMES[verdict]}: ~{estimate:.0f} minimal pairs",
+              f"(95% confidence: {low:.0f} to {high:.0f})")
+    print('Done! A full run would generate about', round(total), 'minimal pairs;',
+          len(sample.reservoir), 'of them are in', outfile)
+
+def serve(lexicon_files: list[str], host: str, port: int, socket_path: str | None,
+          nooptimise: bool, filter_file_path: str | None = None,
+          feature_distance: int | None = None, keep_indels: bool = False) -> None:
+    """
+    Load the lexicons, i.e. output files of `fetchipa`, once, and answer
+    queries about them over HTTP, on `host`:`port` or on the Unix socket at
+    `socket_path`, until interrupted. Pairs of words where one has a sound more
+    than the other are only minimal pairs if `keep_indels` is True, like for
+    `generate`.
+    """
+    from grzegorz.server import (Lexicon, QueryServer, UnixQueryServer)
+    from os.path import (basename, splitext)
+
+    g = MinPairGenerator(not nooptimise, True, True, True, keep_indels)
+    if filter_file_path is not None:
+        g.set_filter_pairs_from_file(filter_file_path)
+    if feature_distance is not None:
+        g.set_feature_distance(feature_distance)
+
+    lexicons = {}
+    for path in lexicon_files:
+        name = splitext(basename(path))[0]
+        lexicons[name] = Lexicon(decode_format(decode_word, readfile(path)), g)
+        print("Loaded", len(lexicons[name]), "words into lexicon", name)
+
+    if socket_path is not None:
+        server = UnixQueryServer(socket_path, lexicons, g)
+        print("Listening on", socket_path)
+    else:
+        server = QueryServer((host, port), lexicons, g)
+        print("Listening on", "http://" + host + ":" + str(port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path is not None:
+            remove(socket_path)
+
+def makedeck(infile: str, outfile: str, split_size: int | None = None,
+             split_by: str | None = None, numproc: int = cpu_count() or 1,
+             since: str | None = None, manifest: str | None = None) -> None:
+    """
+    Create an Anki deck given a file full of minimal pairs. Minimal pairs are
+    read and turned into notes a chunk at a time, so that they never all are
+    in memory at once.
+
+    If `split_by` is "contrast", every kind of minimal pair (phoneme, chroneme,
+    stress) gets its own package and subdeck; if `split_size` isn't None,
+    packages hold at most that many notes, and are built in parallel on
+    `numproc` processes.
+
+    If `since` isn't None, it's the manifest or package of an earlier deck,
+    and only the notes that are new or changed since then are packaged. If
+    `manifest` isn't None, a manifest of all notes is written there.
+    """
+    from grzegorz.anki_integration import export_minpairs
+
+    with stage("makedeck") as measured, open(infile, "r", encoding='utf-8') as f:
+        lines = (line.rstrip("\n") for line in f if line.strip())
+        if since is not None or manifest is not None:
+            lines = changed_minpairs(lines, since, manifest)
+        if split_size is None and split_by is None:
+            measured.items = export_minpairs(map(decode_minpair, lines), outfile)
+            packages = [outfile]
+        else:
+            written = split_makedeck(lines, outfile, split_size, split_by, numproc)
+            for (path, numpairs) in written:
+                print("Wrote", numpairs, "minimal pairs into", path)
+            measured.items = sum(numpairs for (_, numpairs) in written)
+            packages = [path for (path, _) in written]
+    print('Done! Now import', ", ".join(packages), 'in your Anki')
+
+def changed_minpairs(lines: Iterator[str], since: str | None,
+                     manifest: str | None) -> Iterator[str]:
+    """
+    Yield the encoded minimal pairs whose notes aren't in the manifest or
+    package `since`, or have changed since (all of them, if it's None), and
+    record the notes of all minimal pairs in the manifest at `manifest`,
+    unless it's None. `since` and `manifest` may be the same file.
+    """
+    from grzegorz.anki_integration import (note_identity, read_manifest)
+
+    previous = read_manifest(since) if since is not None else {}
+    handle = open(manifest + ".part", "w", encoding='utf-8') if manifest is not None else None
+    unchanged = 0
+    try:
+        for line in lines:
+            (guid, checksum) = note_identity(decode_minpair(line))
+            if handle is not None:
+                handle.write(guid + "\t" + checksum + "\n")
+            if previous.get(guid) == checksum:
+                unchanged += 1
+                continue
+            yield line
+    except BaseException:
+        if handle is not None:
+            handle.close()
+            remove(manifest + ".part")
+        raise
+    if handle is not None:
+        handle.close()
+        replace(manifest + ".part", manifest)
+    if since is not None:
+        print("Skipped", unchanged, "minimal pairs already in", since)
+
+def split_makedeck(lines: Iterator[str], outfile: str, split_size: int | None,
+                   split_by: str | None, numproc: int) -> list[tuple[str, int]]:
+    """
+    Write the encoded minimal pairs into several packages, named after
+    `outfile`, e.g. `deck-phoneme-2.apkg`, and return the path of every
+    package along with how many minimal pairs it got
+    """
+    from grzegorz.anki_integration import (PackageWriter, subdeck, NOTE_CHUNK_SIZE)
+    from grzegorz.pipeline import chunks
+    from collections import deque
+    from os.path import splitext
+
+    (base, extension) = splitext(outfile)
+    g = MinPairGenerator(False, True, True, True, True)
+
+    def group(minpair: WordPair) -> str:
+        if split_by == "contrast":
+            return VERDICT_NAMES[g.check_minpair(minpair)]
+        return ""
+
+    def part(names: list[str], lines: list[str]) -> tuple[str, str, int, list[str]]:
+        names = [name for name in names if name]
+        return ("-".join([base] + names) + extension, *subdeck(*names), lines)
+
+    written = []
+    if split_size is None:
+        # one package per contrast, each of which may be arbitrarily large,
+        # so they're all written to at the same time, a chunk at a time
+        writers = {}
+        try:
+            for chunk in chunks(lines, NOTE_CHUNK_SIZE):
+                groups = {}
+                for line in chunk:
+                    minpair = decode_minpair(line)
+                    groups.setdefault(group(minpair), []).append(minpair)
+                for (name, minpairs) in groups.items():
+                    if name not in writers:
+                        (path, deck_name, deck_id, _) = part([name], [])
+                        writers[name] = PackageWriter(path, deck_name, deck_id)
+                    writers[name].add(minpairs)
+        except BaseException:
+            for writer in writers.values():
+                writer.discard()
+            raise
+        for writer in writers.values():
+            writer.close()
+            written.append((writer.outfile, writer.count))
+        return written
+
+    # packages of `split_size` minimal pairs are independent of each other,
+    # and so are built in parallel, as soon as they're full; at most a few of
+    # them wait at once, so memory stays bounded
+    p = None
+    if numproc > 1:
+        from multiprocessing import Pool
+        p = Pool(numproc)
+    pending = deque()
+    def submit(package: tuple[str, str, int, list[str]]) -> None:
+        if p is None:
+            written.append(export_package(package))
+            return
+        pending.append(p.apply_async(export_package, (package,)))
+        while len(pending) > numproc:
+            written.append(pending.popleft().get())
+
+    try:
+        buffers = {}
+        numbers = {}
+        for line in lines:
+            name = group(decode_minpair(line)) if split_by is not None else ""
+            buffer = buffers.setdefault(name, [])
+            buffer.append(line)
+            if len(buffer) == split_size:
+                numbers[name] = numbers.get(name, 0) + 1
+                submit(part([name, str(numbers[name])], buffer))
+                buffers[name] = []
+        for (name, buffer) in buffers.items():
+            if buffer:
+                numbers[name] = numbers.get(name, 0) + 1
+                submit(part([name, str(numbers[name])], buffer))
+        while pending:
+            written.append(pending.popleft().get())
+    finally:
+        if p is not None:
+            p.close()
+            p.join()
+    return written
+
+def export_package(package: tuple[str, str, int, list[str]]) -> tuple[str, int]:
+    """Write the encoded minimal pairs into a package, in a worker process"""
+    from grzegorz.anki_integration import export_minpairs
+    (path, deck_name, deck_id, lines) = package
+    return (path, export_minpairs(map(decode_minpair, lines), path, deck_name, deck_id))
@@ -15,8 +15,29 @@
 
 from grzegorz.word import *
 from grzegorz.generator import *
+from grzegorz.io import *
+from grzegorz.ingest import wikitext_ipa
+from grzegorz.cache import LookupCache
+from grzegorz.spill import generate_spilled
+from grzegorz.sampling import (sample_minpairs, wilson_interval)
+from grzegorz.ranking import top_minpairs
+from grzegorz.stats import ContrastStats
+from grzegorz.shared import generate_shared
+from grzegorz.wordlist import (verify_cached_file, checksum_path)
+from grzegorz.instrument import (Report, percentile)
+from grzegorz.corpus import (corpus_frequencies, most_frequent)
+from grzegorz.server import (Lexicon, QueryServer, UnixQueryServer)
+from grzegorz.scheduler import (AIMDController, FetchScheduler)
+from grzegorz.fetcher import (FetchResult, parse_retry_after)
+import grzegorz.anki_integration as anki_integration
 
 import unittest
+import sqlite3
+import subprocess
+import sys
+import zipfile
+from os import path
+from tempfile import TemporaryDirectory
 
 g = MinPairGenerator(False, True, True, True)
 
@@ -36,6 +57,19 @@ class GeneratorTests(unittest.TestCase):
         s2 = Syllable("ˈ", [Phone("b", False), Phone("a", False), Phone("z", False)])
         self.assertListEqual(actual.phonology, [s1, s2])
 
+    def test_as_dict(self):
+        expected = {
+            "text": "für",
+            "ipa": "/ˈfyːɐ/",
+            "syllables": [{"stress": "primary",
+                           "phones": [{"sound": "f", "long": False},
+                                      {"sound": "y", "long": True},
+                                      {"sound": "ɐ", "long": False}]}],
+            "num_syllables": 1,
+            "num_phones": 3,
+        }
+        self.assertDictEqual(Word("für", "/ˈfyːɐ/").as_dict(), expected)
+
     def test_long_sound_on_syllable_end(self):
         expected = Syllable(".", [Phone("f", False), Phone("o", True)])
         actual = Word("", "/foː/")
@@ -51,6 +85,15 @@ class GeneratorTests(unittest.TestCase):
         w2 = Word("", "/bamˈbaz/")
         self.assertTrue(g.check_phoneme_contrast((w1, w2)))
 
+    def test_feature_distance_filter(self):
+        g = MinPairGenerator(True, True, True, True)
+        g.set_feature_distance(1)
+        self.assertEqual(g.check_minpair((Word("", "/tak/"), Word("", "/dak/"))), PHONEME_MINPAIR)
+        self.assertEqual(g.check_minpair((Word("", "/tak/"), Word("", "/tʰak/"))), PHONEME_MINPAIR)
+        self.assertEqual(g.check_minpair((Word("", "/nak/"), Word("", "/ɲak/"))), NOT_MINPAIR)
+        g.set_feature_distance(5)
+        self.assertEqual(g.check_minpair((Word("", "/nak/"), Word("", "/ɲak/"))), PHONEME_MINPAIR)
+
     def test_phoneme_contrast_with_chroneme_difference(self):
         w1 = Word("", "/barˈbaz/")
         w2 = Word("", "/bar:ˈbaz/")
@@ -96,5 +139,582 @@ class GeneratorTests(unittest.TestCase):
         w2 = Word("", "/barˌbazˈdo.man/")
         self.assertTrue(g.check_stress_contrast((w1, w2)))
 
+    def test_indel_contrast(self):
+        indels = MinPairGenerator(False, True, True, True, True)
+        self.assertTrue(indels.check_indel_contrast((Word("", "/spɔrt/"), Word("", "/spɔt/"))))
+        self.assertTrue(indels.check_indel_contrast((Word("", "/ˈkat/"), Word("", "/ˈkast/"))))
+        self.assertFalse(indels.check_indel_contrast((Word("", "/spɔrt/"), Word("", "/spɔrt/"))))
+        self.assertFalse(indels.check_indel_contrast((Word("", "/spɔrt/"), Word("", "/pɔt/"))))
+        self.assertEqual(indels.contrast((Word("", "/spɔrt/"), Word("", "/spɔt/"))),
+                         (INDEL_MINPAIR, [("r", "")]))
+        self.assertEqual(g.check_minpair((Word("", "/spɔrt/"), Word("", "/spɔt/"))), NOT_MINPAIR)
+
+    def test_contrast_reports_differing_phones(self):
+        self.assertEqual(g.contrast((Word("", "/ban/"), Word("", "/baŋ/"))),
+                         (PHONEME_MINPAIR, [("n", "ŋ")]))
+        self.assertEqual(g.contrast((Word("", "/bat/"), Word("", "/baːt/"))),
+                         (CHRONEME_MINPAIR, [("a", "aː")]))
+        self.assertEqual(g.contrast((Word("", "/bat/"), Word("", "/xyz/"))),
+                         (NOT_MINPAIR, []))
+
+    def test_feed_finds_same_pairs_as_generate(self):
+        words = [Word("", ipa) for ipa in
+                 ["/bat/", "/pat/", "/ba:t/", "/ˈba.ta/", "/baˈta/", "/bad/", "/bats/", ""]]
+        fed = MinPairGenerator(False, True, True, True)
+        pairs = [pair for word in words for pair in fed.feed(word)]
+        self.assertListEqual(sorted((p[0].ipa, p[1].ipa) for p in pairs),
+                             sorted((p[0].ipa, p[1].ipa) for p in g.generate(words)))
+
+    def test_index_partners_match_generate(self):
+        words = [Word("", ipa) for ipa in
+                 ["/bat/", "/pat/", "/ba:t/", "/ˈba.ta/", "/baˈta/", "/bad/", "/bats/", ""]]
+        index = MinPairIndex(g, words)
+        pairs = {(w.ipa, other.ipa) for w in words for (other, _) in index.partners(w)}
+        expected = {(p[0].ipa, p[1].ipa) for p in g.generate(words)}
+        self.assertSetEqual(pairs, expected | {(b, a) for (a, b) in expected})
+
+        index.remove(words[1])
+        self.assertListEqual([other.ipa for (other, _) in index.partners(words[0])],
+                             ["/ba:t/", "/bad/", "/bats/"])
+
+    def test_index_indel_partners_match_generate(self):
+        indels = MinPairGenerator(False, True, True, True, True)
+        words = [Word("", ipa) for ipa in
+                 ["/spɔrt/", "/spɔt/", "/pɔt/", "/spɔrts/", "/ˈba.ta/", "/ˈba.tar/", "/bat/"]]
+        index = MinPairIndex(indels, words)
+        pairs = {(w.ipa, other.ipa) for w in words for (other, _) in index.partners(w)}
+        expected = {(p[0].ipa, p[1].ipa) for p in indels.generate(words)}
+        self.assertIn(("/spɔrt/", "/spɔt/"), expected)
+        self.assertSetEqual(pairs, expected | {(b, a) for (a, b) in expected})
+
+    def test_generate_indexed_matches_generate(self):
+        indels = MinPairGenerator(False, True, True, True, True)
+        words = [Word("", ipa) for ipa in
+                 ["/spɔrt/", "/bat/", "/spɔt/", "/pat/", "/pɔt/", "/ba:t/", "/spɔrts/",
+                  "/ˈba.ta/", "/baˈta/", "/ˈba.tar/", "", "/bats/"]]
+        for generator in [g, indels]:
+            self.assertListEqual([(p[0].ipa, p[1].ipa) for p in generator.generate_indexed(words)],
+                                 [(p[0].ipa, p[1].ipa) for p in generator.generate(words)])
+
+    def test_top_minpairs(self):
+        words = [decode_word(line) for line in
+                 ["pat, /pat/, 4", "bat, /bat/, 1", "bad, /bad/, 2", "pad, /pad/, 3",
+                  "ba:t, /ba:t/"]]
+        self.assertEqual(encode_word(words[0]), "pat, /pat/, 4")
+        self.assertListEqual([encode_minpair(p) for p in top_minpairs(g, words, 3)],
+                             ["bat, /bat/ -- bad, /bad/", "bad, /bad/ -- pad, /pad/",
+                              "bat, /bat/ -- pat, /pat/"])
+        # at most one /t/-/d/ pair, and one /b/-/p/ pair
+        top = top_minpairs(g, words[:4], 10, pair_quota=1)
+        self.assertListEqual([encode_minpair(p) for p in top],
+                             ["bat, /bat/ -- bad, /bad/", "bad, /bad/ -- pad, /pad/"])
+        # the unranked word comes last
+        top = top_minpairs(g, words, 10, contrast_quota=1)
+        self.assertListEqual([encode_minpair(p) for p in top],
+                             ["bat, /bat/ -- bad, /bad/", "bat, /bat/ -- ba:t, /ba:t/"])
+
+    def test_contrast_stats(self):
+        counted = MinPairGenerator(False, True, True, True, True)
+        counted.stats = ContrastStats()
+        words = [Word("", ipa) for ipa in
+                 ["/bat/", "/pat/", "/spɔrt/", "/spɔt/", "/ˈba.ta/", "/ba.ta/", "/ˈba.da/"]]
+        counted.generate(words)
+        self.assertDictEqual(counted.stats.as_dict(), {
+            "minimal_pairs": 7,
+            "contrasts": {"phoneme": 3, "indel": 3, "stress": 1},
+            "sounds": {"a/∅": 2, "d/t": 2, "b/p": 1, "r/∅": 1, "none/primary": 1},
+            # /bat/ and /ba.ta/ differ by the final syllable of the longer word
+            "positions": {"final": 4, "monosyllable": 2, "initial": 1},
+        })
+
+        # the difference in length doesn't count as another contrast
+        counted.stats = ContrastStats()
+        counted.generate([Word("", "/ˈpa.ta/"), Word("", "/ˈba.ta:/")])
+        self.assertDictEqual(counted.stats.sounds, {"b/p": 1})
+        self.assertDictEqual(counted.stats.positions, {"initial": 1})
+
+    def test_generate_spilled_matches_generate(self):
+        words = [Word(str(i), ipa) for (i, ipa) in enumerate(
+                 ["/bat/", "/pat/", "/ba:t/", "/ˈba.ta/", "/baˈta/", "/bad/", "/bats/",
+                  "/kat/", "/ˈka.ta/", "/ka:t/", "/gat/"])]
+        with TemporaryDirectory() as tmp:
+            infile = path.join(tmp, "ipa.txt")
+            outfile = path.join(tmp, "minpairs.txt")
+            writefile(infile, encode_format(encode_word, words))
+            # small enough that words and pairs are spilled a few at a time
+            generate_spilled(g, infile, outfile, 5000)
+            # no parses are left over from the spill runs
+            self.assertEqual(parse_phonology.cache_info().currsize, 0)
+            self.assertEqual(readfile(outfile),
+                             encode_format(encode_minpair, g.generate(words)))
+
+    def test_generate_shared_matches_generate(self):
+        words = [Word(str(i), ipa) for (i, ipa) in enumerate(
+                 ["/bat/", "/pat/", "/ba:t/", "/ˈba.ta/", "/baˈta/", "/bad/", "",
+                  "/kat/", "/ˈka.ta/", "/ka:t/", "/gat/", "/bat/"])]
+        found = generate_shared(g, words, 2)
+        self.assertListEqual([(words[i], words[j]) for (i, j, _) in found], g.generate(words))
+        self.assertListEqual([verdict for (_, _, verdict) in found],
+                             [g.check_minpair(pair) for pair in g.generate(words)])
+
+        # rejections are counted in the workers, and added up
+        from collections import Counter
+        (single, shared) = (MinPairGenerator(True, True, True, True) for _ in range(2))
+        single.rejections = Counter()
+        shared.rejections = Counter()
+        single.generate(words)
+        generate_shared(shared, words, 2)
+        self.assertDictEqual(shared.rejections, single.rejections)
+
+    def test_sample_minpairs(self):
+        from random import Random
+        words = [Word("", ipa) for ipa in
+                 ["/bat/", "/pat/", "/ba:t/", "/ˈba.ta/", "/baˈta/", "/bad/", "/bats/", ""]]
+        sample = sample_minpairs(g, words, 2, 10.0, Random(0))
+        # there are only so many pairs of words of the same shape to compare
+        self.assertEqual(sample.comparisons, sample.space)
+        self.assertEqual(len(sample.reservoir), 2)
+        expected = {(p[0].ipa, p[1].ipa) for p in g.generate(words)}
+        for pair in sample.reservoir:
+            self.assertIn((pair[0].ipa, pair[1].ipa), expected)
+
+    def test_wilson_interval(self):
+        (low, high) = wilson_interval(0, 100)
+        self.assertEqual(low, 0.0)
+        self.assertGreater(high, 0.0)
+        (low, high) = wilson_interval(30, 100)
+        self.assertLess(low, 0.3)
+        self.assertGreater(high, 0.3)
+
+class InstrumentTests(unittest.TestCase):
+    def test_percentile(self):
+        values = [float(i) for i in range(1, 101)]
+        self.assertEqual(percentile(values, 50), 50.0)
+        self.assertEqual(percentile(values, 99), 99.0)
+        self.assertEqual(percentile(values, 100), 100.0)
+        self.assertEqual(percentile(values, 0), 1.0)
+        self.assertEqual(percentile([3.0], 90), 3.0)
+        self.assertIsNone(percentile([], 50))
+
+    def test_stage_nesting_and_timing(self):
+        from time import sleep
+        report = Report()
+        with report.stage("outer") as outer:
+            sleep(0.02)
+            with report.stage("inner") as inner:
+                inner.items = 10
+                sleep(0.02)
+        with self.assertRaises(ValueError):
+            with report.stage("failing"):
+                raise ValueError()
+        self.assertListEqual([s.name for s in report.stages], ["outer", "inner", "failing"])
+        self.assertGreaterEqual(inner.seconds, 0.02)
+        self.assertGreaterEqual(outer.seconds, inner.seconds + 0.02)
+        # a stage that raised is still timed
+        self.assertGreater(report.stages[2].seconds, 0.0)
+        measured = report.as_dict()["stages"][1]
+        self.assertEqual(measured["items"], 10)
+        self.assertAlmostEqual(measured["items_per_second"], 10 / inner.seconds, delta=0.001)
+
+class IOTests(unittest.TestCase):
+    def test_read_fetched_words(self):
+        with TemporaryDirectory() as tmp:
+            outfile = path.join(tmp, "ipa.txt")
+            writefile(outfile, "bard, /bɑːd/\nfard, \n")
+            writefile(checkpoint_path(outfile), "bard\nxyz\n")
+            self.assertSetEqual(read_fetched_words(outfile), {"bard", "fard", "xyz"})
+
+    def test_read_fetched_words_no_files(self):
+        with TemporaryDirectory() as tmp:
+            self.assertSetEqual(read_fetched_words(path.join(tmp, "ipa.txt")), set())
+
+    def test_checkpointed_writer(self):
+        with TemporaryDirectory() as tmp:
+            outfile = path.join(tmp, "ipa.txt")
+            # as left by a crash in the middle of a line
+            writefile(outfile, "bard, /bɑːd/\nfard, /fɑ")
+            writefile(checkpoint_path(outfile), "bard\nfa")
+            with CheckpointedWriter(outfile, flush_every=2) as writer:
+                writer.write("fard", "fard, /fɑːd/")
+                writer.write("xyz", None)
+                writer.write("card", "card, /kɑːd/")
+            self.assertEqual(readfile(outfile), "bard, /bɑːd/\nfard, /fɑːd/\ncard, /kɑːd/\n")
+            self.assertEqual(readfile(checkpoint_path(outfile)), "bard\nfard\nxyz\ncard\n")
+
+class StubPool:
+    """Answer `apply_async()` at once with the next of the given results for the word"""
+    def __init__(self, answers):
+        self.answers = answers
+        self.calls = []
+
+    def apply_async(self, func, args, callback, error_callback):
+        self.calls.append(args[0])
+        callback(self.answers[args[0]].pop(0))
+
+class SchedulerTests(unittest.TestCase):
+    def test_window_grows_additively(self):
+        controller = AIMDController(maximum=4, initial=2)
+        controller.on_success(0.1)
+        controller.on_success(0.1)
+        self.assertEqual(controller.window, 2)
+        controller.on_success(0.1)
+        self.assertEqual(controller.window, 3)
+        for _ in range(20):
+            controller.on_success(0.1)
+        self.assertEqual(controller.window, 4)
+        self.assertEqual(controller.peak, 4)
+
+    def test_window_halves_on_failure(self):
+        controller = AIMDController(maximum=8, initial=8, minimum=1)
+        controller.on_failure(0.0)
+        self.assertEqual(controller.window, 4)
+        controller.on_failure(0.0)
+        controller.on_failure(0.0)
+        controller.on_failure(0.0)
+        self.assertEqual(controller.window, 1)
+        # a response much slower than the fastest one counts as a failure
+        controller = AIMDController(maximum=8, initial=8)
+        controller.on_success(0.1)
+        controller.on_success(5.0)
+        self.assertEqual(controller.window, 4)
+
+    def test_backoff(self):
+        scheduler = FetchScheduler(None, AIMDController(1), backoff_base=1.0, backoff_cap=8.0)
+        for attempt in range(10):
+            self.assertLessEqual(scheduler.backoff(attempt, None), min(8.0, 2 ** attempt))
+        delay = scheduler.backoff(0, 30.0)
+        self.assertGreaterEqual(delay, 30.0)
+        self.assertLessEqual(delay, 31.0)
+
+    def test_parse_retry_after(self):
+        from datetime import (datetime, timedelta, timezone)
+        from email.utils import format_datetime
+        self.assertEqual(parse_retry_after("120"), 120.0)
+        later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=60), usegmt=True)
+        self.assertAlmostEqual(parse_retry_after(later), 60.0, delta=2.0)
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0)
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertIsNone(parse_retry_after(None))
+
+    def test_run_retries_throttled_requests(self):
+        throttled = lambda word: FetchResult(word, None, 0.0, "HTTP 429", 0.01, True)
+        pool = StubPool({
+            "kot": [throttled("kot"), FetchResult("kot", Word("kot", "/kɔt/"), 0.0)],
+            "pies": [throttled("pies") for _ in range(3)],
+        })
+        scheduler = FetchScheduler(pool, AIMDController(4), max_retries=2, backoff_base=0.01)
+        results = {result.query: result
+                   for result in scheduler.run([("kot", "polish"), ("pies", "polish")])}
+        self.assertIsNone(results["kot"].error)
+        self.assertEqual(results["kot"].word.ipa, "/kɔt/")
+        self.assertEqual(results["pies"].error, "HTTP 429")
+        self.assertEqual(pool.calls.count("kot"), 2)
+        self.assertEqual(pool.calls.count("pies"), 3)
+        self.assertEqual(scheduler.stats.retries, 3)
+        self.assertEqual(scheduler.stats.throttled, 4)
+        self.assertListEqual(scheduler.stats.failures, ["pies"])
+
+class LookupCacheTests(unittest.TestCase):
+    def test_lookups_persist(self):
+        with TemporaryDirectory() as tmp:
+            cachefile = path.join(tmp, "german.txt")
+            with LookupCache("german", 60, cachefile) as cache:
+                cache.record("xyz", "")
+                cache.record("haus", "Haus")
+                cache.record("und", "und")
+            with LookupCache("german", 60, cachefile) as cache:
+                self.assertTrue(cache.is_missing("xyz"))
+                self.assertFalse(cache.is_missing("und"))
+                self.assertEqual(cache.variant("haus"), "Haus")
+                self.assertEqual(cache.variant("und"), "und")
+
+    def test_missing_lookups_expire(self):
+        with TemporaryDirectory() as tmp:
+            with LookupCache("german", 0, path.join(tmp, "german.txt")) as cache:
+                cache.record("xyz", "")
+                self.assertFalse(cache.is_missing("xyz"))
+
+class WordlistTests(unittest.TestCase):
+    def test_verify_cached_file(self):
+        with TemporaryDirectory() as tmp:
+            cached = path.join(tmp, "pl_50k.txt")
+            writefile(cached, "abc\n")
+            self.assertFalse(verify_cached_file(cached))
+            writefile(checksum_path(cached),
+                      "edeaaff3f1774ad2888673770c6d64097e391bc362d7d6fb34982ddf0efd18cb 4")
+            self.assertTrue(verify_cached_file(cached))
+            writefile(cached, "abd\n")
+            self.assertFalse(verify_cached_file(cached))
+
+    def test_corpus_frequencies(self):
+        import gzip
+        with TemporaryDirectory() as tmp:
+            corpus = path.join(tmp, "corpus.txt.gz")
+            with gzip.open(corpus, "wt", encoding='utf-8') as f:
+                f.write("Kot i pies, kot i mysz.\nDon't stop: 3 koty, kot!\n")
+            frequencies = corpus_frequencies([corpus], 1)
+            self.assertEqual(frequencies["kot"], 3)
+            self.assertEqual(frequencies["don't"], 1)
+            self.assertNotIn("3", frequencies)
+            self.assertEqual(most_frequent(frequencies, 3), ["kot", "i", "don't"])
+            self.assertEqual(most_frequent(frequencies, 3, 1), ["i", "don't"])
+
+class AnkiTests(unittest.TestCase):
+    def test_export_minpairs_in_chunks(self):
+        minpairs = [(Word("bat" + str(i), "/bat/"), Word("pat" + str(i), "/pat/"))
+                     for i in range(0, 5)]
+        chunk_size = anki_integration.NOTE_CHUNK_SIZE
+        anki_integration.NOTE_CHUNK_SIZE = 2
+        try:
+            with TemporaryDirectory() as tmp:
+                outfile = path.join(tmp, "deck.apkg")
+                self.assertEqual(anki_integration.export_minpairs(iter(minpairs), outfile), 5)
+                with zipfile.ZipFile(outfile) as z:
+                    z.extract("collection.anki2", tmp)
+                db = sqlite3.connect(path.join(tmp, "collection.anki2"))
+                self.assertEqual(db.execute("SELECT count(*) FROM notes").fetchone()[0], 5)
+                db.close()
+        finally:
+            anki_integration.NOTE_CHUNK_SIZE = chunk_size
+
+    def test_note_guid_matches_genanki(self):
+        from genanki import guid_for
+        for fields in (["bat", "", "/bat/", "pat", "", "/pat/"], ["für", "", "/fyːɐ/", "", "", ""]):
+            self.assertEqual(anki_integration.note_guid(fields), guid_for(*fields))
+
+    def test_card_requirements_match_genanki(self):
+        model = anki_integration.grzegorz_minpair_model
+        self.assertListEqual(anki_integration.card_requirements(model),
+                             [tuple(requirement) for requirement in model._req])
+
+    def test_package_writer_matches_genanki(self):
+        import genanki
+        minpairs = [(Word("bat", "/bat/"), Word("pat", "/pat/")),
+                    (Word("für", "/fyːɐ/"), Word("vor", "/foːɐ/"))]
+        timestamp = 1700000000.0
+        with TemporaryDirectory() as tmp:
+            ours = path.join(tmp, "ours.apkg")
+            writer = anki_integration.PackageWriter(ours, anki_integration.DECK_NAME,
+                                                    anki_integration.DECK_ID, timestamp)
+            writer.add(minpairs)
+            writer.close()
+            deck = genanki.Deck(anki_integration.DECK_ID, anki_integration.DECK_NAME)
+            for minpair in minpairs:
+                fields = anki_integration.minpair_fields(minpair)
+                deck.add_note(genanki.Note(model=anki_integration.grzegorz_minpair_model,
+                                           fields=fields, guid=anki_integration.note_guid(fields)))
+            theirs = path.join(tmp, "theirs.apkg")
+            genanki.Package(deck).write_to_file(theirs, timestamp=timestamp)
+            rows = []
+            for (i, package) in enumerate((ours, theirs)):
+                with zipfile.ZipFile(package) as z:
+                    z.extract("collection.anki2", path.join(tmp, str(i)))
+                db = sqlite3.connect(path.join(tmp, str(i), "collection.anki2"))
+                rows.append([db.execute("SELECT * FROM " + table + " ORDER BY id").fetchall()
+                             for table in ("notes", "cards", "col")])
+                db.close()
+            self.assertEqual(len(rows[0][1]), 4)
+            self.assertListEqual(rows[0], rows[1])
+
+    def test_changed_minpairs(self):
+        from grzegorz.subcommands import changed_minpairs
+        old = ["bat, /bat/ -- pat, /pat/", "bat, /bat/ -- bad, /bad/"]
+        new = ["bat, /bat/ -- pat, /pat/", "bat, /bat/ -- bad, /bat/", "ban, /ban/ -- bang, /baŋ/"]
+        with TemporaryDirectory() as tmp:
+            manifest = path.join(tmp, "manifest.txt")
+            self.assertListEqual(list(changed_minpairs(iter(old), None, manifest)), old)
+            self.assertListEqual(list(changed_minpairs(iter(new), manifest, manifest)), new[1:])
+            self.assertListEqual(list(changed_minpairs(iter(new), manifest, None)), [])
+
+class IngestTests(unittest.TestCase):
+    def test_wikitext_ipa_picks_language_section(self):
+        text = "==English==\n* {{IPA|en|/ʌnd/}}\n==German==\n* {{IPA|de|/ʊnt/|[ʊnt]}}\n"
+        self.assertEqual(wikitext_ipa(text, "German"), "/ʊnt/")
+
+    def test_wikitext_ipa_missing_language(self):
+        text = "==English==\n* {{IPA|en|/ʌnd/}}\n"
+        self.assertEqual(wikitext_ipa(text, "German"), "")
+
+    def test_ingestipa_nothing_found(self):
+        from grzegorz.subcommands import ingestipa
+        with TemporaryDirectory() as tmp:
+            (dump, infile, outfile) = [path.join(tmp, name)
+                                       for name in ["dump.jsonl", "words.txt", "ipa.txt"]]
+            writefile(dump, '{"word": "xyz", "lang": "English", "sounds": []}\n')
+            writefile(infile, "english\nxyz\nabc")
+            ingestipa(dump, infile, outfile, False, 1)
+            self.assertEqual(readfile(outfile), "")
+            self.assertListEqual(decode_format(decode_word, readfile(outfile)), [])
+
+# stand-ins for downloading, which must be picklable to run in worker processes
+def stub_wordlist_command(language, bounds, outfile, cache=True):
+    writefile(outfile, "\n".join([language, "bat", "pat", "bad", "kot"]))
+    return 0
+
+def stub_fetch_word(word, language, try_variants=True):
+    return FetchResult(word, Word(word, "/" + word + "/"), 0.0)
+
+def stub_makedeck(infile, outfile, *args):
+    if infile.startswith("german"):
+        raise ValueError("no deck for German")
+    writefile(outfile, "")
+
+class FullmakeTests(unittest.TestCase):
+    def test_multi_fullmake(self):
+        import os
+        import grzegorz.instrument as instrument
+        import grzegorz.scheduler as scheduler
+        import grzegorz.subcommands as subcommands
+
+        stubs = {(subcommands, "wordlist_command"): stub_wordlist_command,
+                 (subcommands, "makedeck"): stub_makedeck,
+                 (scheduler, "fetch_word"): stub_fetch_word}
+        originals = {key: getattr(*key) for key in stubs}
+        cwd = os.getcwd()
+        with TemporaryDirectory() as tmp:
+            os.environ["GRZEGORZ_CACHE_DIR"] = path.join(tmp, "cache")
+            os.chdir(tmp)
+            for ((module, name), stub) in stubs.items():
+                setattr(module, name, stub)
+            report = instrument.start_report()
+            try:
+                with self.assertRaises(SystemExit):
+                    subcommands.multi_fullmake(["german", "polish"], "4", False, 1)
+                self.assertTrue(path.exists("grzegorz-polish-minpairs.apkg"))
+                self.assertEqual(readfile("polish-minpairs.txt"), "bat, /bat/ -- bad, /bad/")
+            finally:
+                instrument._report = None
+                for ((module, name), original) in originals.items():
+                    setattr(module, name, original)
+                del os.environ["GRZEGORZ_CACHE_DIR"]
+                os.chdir(cwd)
+        names = [measured.name for measured in report.stages]
+        for language in ["german", "polish"]:
+            for name in ["wordlist", "fetchipa", "generate"]:
+                self.assertIn(language + "-" + name, names)
+        self.assertGreater(sum(report.rejections.values()), 0)
+
+class ServerTests(unittest.TestCase):
+    words = [Word(ipa.strip("/"), ipa) for ipa in
+             ["/spɔrt/", "/spɔt/", "/bat/", "/pat/", "/ba:t/", "/ˈba.ta/", "/baˈta/", "/bad/"]]
+
+    def setUp(self):
+        import threading
+        lexicons = {"en": Lexicon(self.words, g), "pl": Lexicon([Word("kot", "/kɔt/")], g)}
+        self.server = QueryServer(("127.0.0.1", 0), lexicons, g)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def query(self, url):
+        """Return the status and the JSON body of the answer to `url`"""
+        import json
+        from urllib.error import HTTPError
+        from urllib.parse import quote
+        from urllib.request import urlopen
+        address = "http://127.0.0.1:" + str(self.server.server_address[1])
+        try:
+            with urlopen(address + quote(url, safe="/?=&")) as response:
+                return (response.status, json.load(response))
+        except HTTPError as err:
+            return (err.code, json.load(err))
+
+    def test_partners_match_generate(self):
+        pairs = set()
+        for word in self.words:
+            (status, body) = self.query("/partners?lexicon=en&word=" + word.text)
+            self.assertEqual(status, 200)
+            pairs |= {tuple(sorted((word.ipa, other["ipa"]))) for other in body["partners"]}
+        self.assertSetEqual(pairs, {tuple(sorted((a.ipa, b.ipa))) for (a, b) in g.generate(self.words)})
+        # no indels, unless the generator keeps them
+        self.assertNotIn(("/spɔrt/", "/spɔt/"), pairs)
+
+    def test_queries(self):
+        (status, body) = self.query("/analyse?ipa=/kɔt/")
+        self.assertEqual(status, 200)
+        self.assertDictEqual(body, Word("", "/kɔt/").as_dict())
+        self.assertEqual(self.query("/check?ipa1=/ban/&ipa2=/baŋ/"),
+                         (200, {"verdict": "phoneme", "differences": [["n", "ŋ"]]}))
+        self.assertEqual(self.query("/check?ipa1=/ban/&ipa2=/xyz/"),
+                         (200, {"verdict": "none", "differences": []}))
+        self.assertEqual(self.query("/lexicons"), (200, {"en": 8, "pl": 1}))
+        (status, body) = self.query("/partners?lexicon=pl&ipa=/kɔd/")
+        self.assertEqual(status, 200)
+        self.assertListEqual(body["partners"], [{"text": "kot", "ipa": "/kɔt/",
+                                                 "verdict": "phoneme",
+                                                 "differences": [["d", "t"]]}])
+
+    def test_errors(self):
+        for (url, status) in [("/check?ipa1=/ban/", 400),
+                              ("/analyse", 400),
+                              # several lexicons, and none chosen
+                              ("/partners?word=bat", 400),
+                              ("/partners?lexicon=de&word=bat", 404),
+                              ("/partners?lexicon=en&word=xyz", 404),
+                              ("/nothing", 404)]:
+            (answer, body) = self.query(url)
+            self.assertEqual(answer, status, url)
+            self.assertIn("error", body)
+
+    def test_unix_socket(self):
+        import json
+        import socket
+        import threading
+        with TemporaryDirectory() as tmp:
+            socket_path = path.join(tmp, "grzegorz.sock")
+            server = UnixQueryServer(socket_path, {"en": Lexicon(self.words, g)}, g)
+            thread = threading.Thread(target=server.serve_forever)
+            thread.start()
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                    client.connect(socket_path)
+                    client.sendall(b"GET /lexicons HTTP/1.1\r\nHost: grzegorz\r\n"
+                                   + b"Connection: close\r\n\r\n")
+                    response = b""
+                    while data := client.recv(4096):
+                        response += data
+            finally:
+                server.shutdown()
+                server.server_close()
+                thread.join()
+        (head, body) = response.split(b"\r\n\r\n", 1)
+        self.assertTrue(head.startswith(b"HTTP/1.1 200"))
+        self.assertDictEqual(json.loads(body), {"en": 8})
+
+class StartupTests(unittest.TestCase):
+    """`analyse` and `check` are run a lot from scripts, so they must start fast"""
+    # microseconds spent importing grzegorz's own modules, generously
+    IMPORT_TIME_BUDGET = 150000
+    HEAVY_MODULES = ["requests", "bs4", "fake_useragent", "genanki", "tqdm", "multiprocessing"]
+
+    def import_times(self, *args: str) -> dict[str, int]:
+        """Return the cumulative import time of every top-level import"""
+        result = subprocess.run([sys.executable, "-X", "importtime", "-m", "grzegorz", *args],
+                                capture_output=True, text=True,
+                                cwd=path.dirname(path.dirname(path.abspath(__file__))))
+        times = {}
+        for line in result.stderr.splitlines():
+            fields = line.removeprefix("import time:").split("|")
+            if len(fields) == 3 and fields[1].strip().isdigit():
+                times[fields[2].strip()] = int(fields[1])
+        return times
+
+    def assert_fast_startup(self, *args: str) -> None:
+        times = self.import_times(*args)
+        for module in self.HEAVY_MODULES:
+            self.assertNotIn(module, times)
+        own = sum(t for (name, t) in times.items() if name.startswith("grzegorz"))
+        self.assertLess(own, self.IMPORT_TIME_BUDGET)
+
+    def test_analyse_startup(self):
+        self.assert_fast_startup("analyse", "/barˈbaz/")
+
+    def test_check_startup(self):
+        self.assert_fast_startup("check", "/barˈbaz/", "/bamˈbaz/")
+
 if __name__ == '__main__':
     unittest.main()
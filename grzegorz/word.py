@@ -14,12 +14,23 @@
 # grzegorz.  If not, see <https://www.gnu.org/licenses/>.
 
 import re
+from functools import lru_cache
 
 PHONEME_MINPAIR = 1
 CHRONEME_MINPAIR = 2
 STRESS_MINPAIR = 3
+INDEL_MINPAIR = 4
 NOT_MINPAIR = 0
 
+"""Machine-readable names of the verdicts above"""
+VERDICT_NAMES = {
+    PHONEME_MINPAIR: "phoneme",
+    CHRONEME_MINPAIR: "chroneme",
+    STRESS_MINPAIR: "stress",
+    INDEL_MINPAIR: "indel",
+    NOT_MINPAIR: "none",
+}
+
 class Phone:
     """ Aside from a mere sound, a phone can also be long or short """
     def __init__(self, sound: str, long: bool):
@@ -54,82 +65,116 @@ class Syllable:
 
 class Word:
     """
-    All we care about is the word's text and its IPA
+    All we care about is the word's text and its IPA, and, if known, its rank
+    in the frequency list it comes from (1 being the most frequent)
     """
-    def __init__(self, text: str, ipa: str) -> None:
+    def __init__(self, text: str, ipa: str, rank: int | None = None) -> None:
         self.text = text
         self.ipa = ipa
+        self.rank = rank
         self.phonology = self.parse_phonologically()
 
     def print_human_readable(self) -> None:
         print(self.ipa, self.text)
         for syllable in self.phonology:
-            match syllable.stress:
-                case 'ˈ':
-                    stress = "primary"
-                case 'ˌ':
-                    stress = "secondary"
-                case _:
-                    stress = "none"
-            print("stress type:", stress)
+            print("stress type:", stress_name(syllable.stress))
             print("  [ ", end="")
             for sound in syllable.contents:
                 print(sound, " ", sep="", end="")
             print("]")
 
+    def as_dict(self) -> dict:
+        """
+        Return the phonological parse of the word in a form that can be
+        serialised, e.g. as JSON
+        """
+        return {
+            "text": self.text,
+            "ipa": self.ipa,
+            "syllables": [
+                {
+                    "stress": stress_name(syllable.stress),
+                    "phones": [{"sound": phone.sound, "long": phone.long}
+                               for phone in syllable.contents],
+                }
+                for syllable in self.phonology
+            ],
+            "num_syllables": len(self.phonology),
+            "num_phones": sum(len(syllable.contents) for syllable in self.phonology),
+        }
+
     def parse_phonologically(self) -> list[Syllable]:
         """
         Return the phonological parse of the Word's IPA
         """
-        chars = parse_ipa_characters(self.ipa)
-        syllables = []
-        stress = "." # assume the first syllable is unemphasised
-        sounds = []
-
-        # sometimes we need to skip characters, namely chronemes: the same sound
-        # appearing consecutively is marked as one sound, but long in length
-        skip = False
-        for i in range(0, len(chars)):
-            # don't skip if the last sound was long and we're on the last character,
-            # since we need to add the sounds to a new syllable
-            if skip and not (sounds[-1].long and i == len(chars) - 1):
-                skip = False
-                continue
-
-            crnt = chars[i]
-            next = peek(chars[i :])
-
-            # If the current character isn't a syllable (stress) mark, then that
-            # means we've encountered a sound (or a chroneme character, by accident,
-            # but that's skipped). Next, figure out if the current sound is short or
-            # long
-            if not skip and crnt not in IPA_SYLLABLES:
-                is_long_sound = False
-                if next == crnt or next in IPA_CHRONEMES:
-                    is_long_sound = True
-                    skip = True
-                # skip chroneme characters if we've accidentally encountered them
-                if not crnt in IPA_CHRONEMES:
-                    phone = Phone(crnt, is_long_sound)
-                    sounds.append(phone)
-
-            # If we found a syllable mark, or the transcription ended, then we know
-            # that the previous syllable ends here. Thus, add all the sounds we've
-            # encountered so far to it, and prepare for a new syllable. NOTE: if
-            # we've encountered the end, then processing ends anyways
-            if crnt in IPA_SYLLABLES or i == len(chars) - 1:
-                if len(sounds) != 0:
-                    syllable = Syllable(stress, sounds)
-                    syllables.append(syllable)
-                stress = crnt
-                sounds = []
-
-        return syllables
+        return parse_phonology(self.ipa)
 
 WordPair = tuple[Word, Word]
 
 ### Helper functions ###
 
+@lru_cache(maxsize=65536)
+def parse_phonology(ipa: str) -> list[Syllable]:
+    """
+    Return the phonological parse of the given IPA. Parses are cached, since
+    the same IPA is often parsed over and over again; NOTE: the result is
+    therefore shared, and mustn't be modified.
+    """
+    chars = parse_ipa_characters(ipa)
+    syllables = []
+    stress = "." # assume the first syllable is unemphasised
+    sounds = []
+
+    # sometimes we need to skip characters, namely chronemes: the same sound
+    # appearing consecutively is marked as one sound, but long in length
+    skip = False
+    for i in range(0, len(chars)):
+        # don't skip if the last sound was long and we're on the last character,
+        # since we need to add the sounds to a new syllable
+        if skip and not (sounds[-1].long and i == len(chars) - 1):
+            skip = False
+            continue
+
+        crnt = chars[i]
+        next = peek(chars[i :])
+
+        # If the current character isn't a syllable (stress) mark, then that
+        # means we've encountered a sound (or a chroneme character, by accident,
+        # but that's skipped). Next, figure out if the current sound is short or
+        # long
+        if not skip and crnt not in IPA_SYLLABLES:
+            is_long_sound = False
+            if next == crnt or next in IPA_CHRONEMES:
+                is_long_sound = True
+                skip = True
+            # skip chroneme characters if we've accidentally encountered them
+            if not crnt in IPA_CHRONEMES:
+                phone = Phone(crnt, is_long_sound)
+                sounds.append(phone)
+
+        # If we found a syllable mark, or the transcription ended, then we know
+        # that the previous syllable ends here. Thus, add all the sounds we've
+        # encountered so far to it, and prepare for a new syllable. NOTE: if
+        # we've encountered the end, then processing ends anyways
+        if crnt in IPA_SYLLABLES or i == len(chars) - 1:
+            if len(sounds) != 0:
+                syllable = Syllable(stress, sounds)
+                syllables.append(syllable)
+            stress = crnt
+            sounds = []
+
+    return syllables
+
+def stress_name(mark: str) -> str:
+    """Return the type of stress that the given syllable mark denotes"""
+    match mark:
+        case 'ˈ':
+            return "primary"
+        case 'ˌ':
+            return "secondary"
+        case _:
+            return "none"
+
 def parse_ipa_characters(ipa: str) -> list[str]:
     """ Given an IPA transliteration, return all the IPA characters in it """
     # Remove any any forward slashes, square brackets or round parentheses that
@@ -13,7 +13,14 @@
 # You should have received a copy of the GNU General Public License along with
 # grzegorz.  If not, see <https://www.gnu.org/licenses/>.
 
+from grzegorz.cache import cache_dir
+
 import requests
+from hashlib import sha256
+from itertools import islice
+from os import replace
+from os.path import (exists, getsize, join)
+from typing import Iterator
 
 VALID_LANGUAGES = [
     # Germanic languages
@@ -69,20 +76,33 @@ RESOURCES_REPO_LINK = 'https://raw.githubusercontent.com/hermitdave/FrequencyWor
 """All the wordlists are fetched from here"""
 
 
-def wordlist(lang: str, upperbound: int, lowerbound: int = 0) -> list[str]:
+def wordlist(lang: str, upperbound: int, lowerbound: int = 0, cache: bool = True) -> list[str]:
     """
     Return the most common words that are between index `lowerbound` and
     `upperbound` in the given language. Note that the first element is always
     the language name. If it isn't present, then the language is invalid.
+
+    Unless `cache` is False, the whole frequency list is downloaded once and
+    kept in the cache directory, so that later calls don't need the network.
+    Otherwise, only the first `upperbound` lines are downloaded.
     """
     if not valid_lang(lang):
         return []
 
     language = lang_name(lang)
     link = wordlist_link_for_lang(lang)
-    words_kept_slice = slice(lowerbound, upperbound)
-    raw_words = fetch_contents(link).splitlines()[words_kept_slice]
-    raw_words = [line.split()[0] for line in raw_words]
+    if cache:
+        lines = cached_lines(link, join(cache_dir("wordlists"), lang_code(lang) + "_50k.txt"))
+    else:
+        lines = stream_lines(link)
+    try:
+        raw_words = list(islice(lines, lowerbound, upperbound))
+    except requests.RequestException as err:
+        print("Error: couldn't fetch the wordlist:", err)
+        return []
+    finally:
+        lines.close()
+    raw_words = [line.split()[0] for line in raw_words if line.strip()]
     raw_words.insert(0, language)
     return raw_words
 
@@ -125,7 +145,60 @@ def wordlist_link_for_lang(lang: str):
     link = RESOURCES_REPO_LINK + "/" + code + "/" + code + "_50k.txt"
     return link
 
-def fetch_contents(link: str):
-    """Return the string containing the webpage at `link`"""
-    res = requests.get(link)
-    return res.text
+def stream_lines(link: str) -> Iterator[str]:
+    """
+    Yield the lines of the text file at `link` as they are downloaded; stop
+    downloading as soon as the caller stops asking for more lines
+    """
+    with requests.get(link, stream=True, timeout=30) as res:
+        res.raise_for_status()
+        for line in res.iter_lines():
+            yield line.decode('utf-8')
+
+def cached_lines(link: str, path: str) -> Iterator[str]:
+    """
+    Yield the lines of the text file at `link`, which is downloaded to `path`
+    first, unless a previous download is already there
+    """
+    if not verify_cached_file(path):
+        download_file(link, path)
+    with open(path, "r", encoding='utf-8') as f:
+        for line in f:
+            yield line.rstrip("\n")
+
+def download_file(link: str, path: str) -> None:
+    """
+    Download the file at `link` to `path`, and store its checksum and size
+    next to it. The file only appears at `path` once it is complete.
+    """
+    partial_path = path + ".part"
+    checksum = sha256()
+    with requests.get(link, stream=True, timeout=30) as res:
+        res.raise_for_status()
+        with open(partial_path, "wb") as f:
+            for chunk in res.iter_content(chunk_size=65536):
+                f.write(chunk)
+                checksum.update(chunk)
+    replace(partial_path, path)
+    with open(checksum_path(path), "w", encoding='utf-8') as f:
+        f.write(checksum.hexdigest() + " " + str(getsize(path)))
+
+def verify_cached_file(path: str) -> bool:
+    """
+    Check that the file at `path` is exactly the one that was downloaded, i.e.
+    that it has the recorded size and checksum
+    """
+    if not exists(path) or not exists(checksum_path(path)):
+        return False
+    with open(checksum_path(path), "r", encoding='utf-8') as f:
+        fields = f.read().split()
+    if len(fields) != 2 or fields[1] != str(getsize(path)):
+        return False
+    checksum = sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(65536):
+            checksum.update(chunk)
+    return checksum.hexdigest() == fields[0]
+
+def checksum_path(path: str) -> str:
+    return path + ".sha256"